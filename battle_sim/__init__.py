@@ -0,0 +1,4 @@
+import os
+
+# Saved teams live next to the package, wherever it is run from
+TEAMS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "teams")
@@ -0,0 +1,112 @@
+"""Command line entry point.
+
+    python -m battle_sim                          open the GUI
+    python -m battle_sim gui --journal fight.log  open it journaled, resuming fight.log if it exists
+    python -m battle_sim gui --autosave fight.db  open it autosaved, resuming fight.db if it exists
+    python -m battle_sim serve --port 8765        host battles over TCP (see server.py)
+    python -m battle_sim simulate a.json b.json   Monte Carlo a saved encounter
+    python -m battle_sim teams                    list the saved teams
+
+Each command imports only what it uses, so the headless ones never load
+tkinter and start quickly in scripts and batch jobs.
+"""
+import argparse
+import os
+import sys
+from battle_sim import TEAMS_FOLDER
+
+
+def gui(args):
+    from battle_sim.battleGUI import main
+
+    main(seed=args.seed, journal=args.journal, autosave_path=args.autosave)
+
+
+def serve(args):
+    from battle_sim.server import main
+
+    main(["--host", args.host, "--port", str(args.port), "--teams", args.teams])
+
+
+def simulate(args):
+    from battle_sim.library import TeamLibrary
+    from battle_sim.simulation import Attack, Simulation
+
+    teams = [TeamLibrary(os.path.dirname(path) or ".").load(os.path.basename(path)) for path in args.team_files]
+    attacks = {}
+    for spec in args.attack:
+        name, _, expression = spec.partition("=")
+        attacks[name] = expression
+    simulation = Simulation(teams, attacks=attacks, default_attack=Attack(expression=args.default_attack),
+                            seed=args.seed, max_rounds=args.max_rounds)
+    result = simulation.run(args.runs, workers=args.workers)
+
+    print(f"{result.runs} battles, {result.mean_rounds():.2f} rounds on average")
+    for name, rate in result.win_rates().items():
+        print(f"{'draw' if name is None else name:30} {rate:8.1%}")
+    if args.verbose:
+        for team, label, hp_left, deaths in zip(teams, result.labels, result.mean_hp_left(), result.death_rates()):
+            print(f"\n{label}")
+            for creature, hp, died in zip(team, hp_left, deaths):
+                print(f"  {creature.name:28} {hp:8.1f} HP left {died:8.1%} dead")
+
+
+def teams(args):
+    from battle_sim.library import TeamLibrary
+
+    if not os.path.isdir(args.teams):
+        print(f"No teams folder at {args.teams!r}.")
+        return 1
+    for entry in TeamLibrary(args.teams).entries():
+        print(f"{entry.filename:30} {entry.team_name or '?':30} {entry.member_count:6} creatures")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m battle_sim", description="Run battles in the GUI or headless.")
+    commands = parser.add_subparsers(dest="command")
+
+    command = commands.add_parser("gui", help="open the battle GUI (the default)")
+    command.add_argument("--seed", help="seed of the battle's RNG")
+    saving = command.add_mutually_exclusive_group()
+    saving.add_argument("--journal", metavar="FILE",
+                        help="journal the battle to FILE, resuming the battle already in it after a crash")
+    saving.add_argument("--autosave", metavar="FILE",
+                        help="autosave the battle to the SQLite file FILE every few seconds, "
+                             "resuming the battle already in it after a crash")
+    command.set_defaults(run=gui)
+
+    command = commands.add_parser("serve", help="host battles over a JSON-lines TCP API")
+    command.add_argument("--host", default="127.0.0.1")
+    command.add_argument("--port", type=int, default=8765)
+    command.add_argument("--teams", default=TEAMS_FOLDER, help="folder with saved team files")
+    command.set_defaults(run=serve)
+
+    command = commands.add_parser("simulate", help="simulate an encounter between saved teams")
+    command.add_argument("team_files", nargs="+", metavar="TEAM_FILE", help="JSON or binary team files")
+    command.add_argument("--runs", type=int, default=1000)
+    command.add_argument("--seed", default=0)
+    command.add_argument("--workers", type=int, help="processes to use (default: one per CPU)")
+    command.add_argument("--max-rounds", type=int, default=100)
+    command.add_argument("--attack", action="append", default=[], metavar="NAME=DICE",
+                         help="attack of one creature, e.g. Fighter=1d8+3 (repeatable)")
+    command.add_argument("--default-attack", default="1d6", metavar="DICE",
+                         help="attack of every other creature (default 1d6)")
+    command.add_argument("-v", "--verbose", action="store_true", help="also print HP left and deaths per creature")
+    command.set_defaults(run=simulate)
+
+    command = commands.add_parser("teams", help="list the saved teams")
+    command.add_argument("--teams", default=TEAMS_FOLDER, help="folder with saved team files")
+    command.set_defaults(run=teams)
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        args = parser.parse_args(["gui"])
+    try:
+        return args.run(args) or 0
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
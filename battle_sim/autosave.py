@@ -0,0 +1,261 @@
+import json
+import sqlite3
+import threading
+from characters import instrumentation
+from battle_sim.battle import Battle
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS battle (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS creatures (
+    idx INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    alive INTEGER NOT NULL,
+    max_hp INTEGER NOT NULL,
+    real_hp INTEGER NOT NULL,
+    temp_hp INTEGER NOT NULL,
+    shield INTEGER NOT NULL,
+    stats TEXT NOT NULL,
+    resistances TEXT NOT NULL
+);
+"""
+_INSERT_CREATURE = "INSERT INTO creatures VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+_UPDATE_HP = "UPDATE creatures SET alive = ?, max_hp = ?, real_hp = ?, temp_hp = ?, shield = ? WHERE idx = ?"
+_UPDATE_RESISTANCES = "UPDATE creatures SET resistances = ? WHERE idx = ?"
+_SET_BATTLE = "INSERT OR REPLACE INTO battle VALUES (?, ?)"
+
+
+class Autosave:
+    """Incremental autosave of a battle to an SQLite file.
+
+    Listeners note what changed as it happens: the HP and alive flag of a hurt
+    creature, new resistances, the turn order after initiative or an undo, and
+    the round and turn cursor after each turn, death and resurrection. save()
+    writes only those rows, in one transaction, so a crash leaves the file at
+    the last complete save.
+    Creatures joining or leaving change every index, so they only flag the
+    roster, and the next save() rewrites the whole battle once, however many
+    changes came before it.
+
+    Changes are captured on the thread that makes them, so start() can run
+    save() on a background timer while the battle is played elsewhere. Stats
+    have no change events: edits to them are saved with the next full rewrite.
+    """
+
+    # Attempts at serializing the roster while another thread changes it
+    FULL_RETRIES = 3
+
+    def __init__(self, battle: Battle, path: str, interval: float = 5.0):
+        self.battle = battle
+        self.path = path
+        self.interval = interval
+        # Error of the last failed timed save, retried on the next tick
+        self.error = None
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+        self._write_lock = threading.Lock()
+
+        # Pending changes, swapped out by save() under _lock. Creatures are
+        # saved by their index in _creatures, which save() renews when the
+        # roster has changed.
+        self._lock = threading.Lock()
+        self._roster_changed = True
+        self._hp = {}
+        self._resistances = {}
+        self._fields = {}
+        self._creatures = []
+        self._index = {}
+        # Creatures listened to, by id. Only changed on the thread changing the battle.
+        self._followed = {}
+
+        self._stop = threading.Event()
+        self._thread = None
+
+        battle.add_listener(self._on_battle_event)
+        self._follow()
+        self.save()
+
+    @property
+    def pending(self) -> bool:
+        """Whether there are changes not saved yet."""
+        return bool(self._roster_changed or self._hp or self._resistances or self._fields)
+
+    def start(self):
+        """Save every interval seconds on a daemon thread until close()."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.save()
+                self.error = None
+            except (sqlite3.Error, OSError, RuntimeError) as e:
+                self.error = e
+
+    def close(self):
+        """Stop the timer, save what is left and let go of the battle."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.battle.remove_listener(self._on_battle_event)
+        try:
+            self.save()
+        finally:
+            for creature in self._followed.values():
+                creature.remove_listener(self._on_creature_event)
+            self._followed = {}
+            self._connection.close()
+
+    def save(self) -> int:
+        """Write the pending changes. Returns the number of rows written.
+
+        If the write fails, the changes stay pending (unless newer ones
+        replaced them) and the error is raised.
+        """
+        with self._write_lock:
+            with self._lock:
+                full = self._roster_changed
+                hp, resistances, fields = self._hp, self._resistances, self._fields
+                self._hp, self._resistances, self._fields = {}, {}, {}
+                if full:
+                    # The full state includes every change pending so far
+                    hp, resistances, fields = {}, {}, {}
+            if not (full or hp or resistances or fields):
+                return 0
+            try:
+                state = self._full_state() if full else None
+                return self._write(state, hp, resistances, fields)
+            except BaseException:
+                with self._lock:
+                    self._roster_changed = self._roster_changed or full
+                    for pending, taken in ((self._hp, hp), (self._resistances, resistances),
+                                           (self._fields, fields)):
+                        for key, value in taken.items():
+                            pending.setdefault(key, value)
+                raise
+
+    def _full_state(self) -> dict:
+        """Index the creatures now in the battle and return the whole battle state.
+
+        With start(), this runs on the timer thread while the battle may be
+        changing. Creature events are dropped until the new index is in place,
+        and a creature changing after that is noted again and saved next time.
+        A roster changing mid-way breaks the iteration, so it is retried, and
+        its creature_added event queues another full rewrite anyway.
+        """
+        for attempt in range(self.FULL_RETRIES):
+            try:
+                with self._lock:
+                    self._creatures = self.battle.all_creatures()
+                    self._index = {id(c): i for i, c in enumerate(self._creatures)}
+                    self._roster_changed = False
+                return self.battle.to_dict(sparse=True)
+            except (RuntimeError, KeyError):
+                with self._lock:
+                    self._roster_changed = True
+                if attempt == self.FULL_RETRIES - 1:
+                    raise RuntimeError("The battle roster kept changing during the save.")
+
+    def _write(self, full, hp: dict, resistances: dict, fields: dict) -> int:
+        rows = 0
+        with self._connection:
+            if full is not None:
+                self._connection.execute("DELETE FROM creatures")
+                self._connection.execute("DELETE FROM battle")
+                self._connection.executemany(_INSERT_CREATURE, (
+                    (i, c["name"], c["alive"], c["hp"]["max_hp"], c["hp"]["real_hp"], c["hp"]["temp_hp"],
+                     c["hp"]["shield"], json.dumps(c["stats"]), json.dumps(c["resistances"]))
+                    for i, c in enumerate(full["creatures"])))
+                fields = {**{key: value for key, value in full.items() if key != "creatures"}, **fields}
+                rows += len(full["creatures"])
+            self._connection.executemany(_UPDATE_HP, ((*values, i) for i, values in hp.items()))
+            self._connection.executemany(_UPDATE_RESISTANCES,
+                                         ((json.dumps(r), i) for i, r in resistances.items()))
+            self._connection.executemany(_SET_BATTLE, ((key, json.dumps(value)) for key, value in fields.items()))
+        return rows + len(hp) + len(resistances) + len(fields)
+
+    # ----- Change tracking -----
+    def _follow(self, creatures=None):
+        """Listen to the creatures now in the battle and stop listening to the ones gone.
+
+        Called from battle events, on the thread changing the battle, so a
+        creature's listeners never change while it notifies them.
+        """
+        if creatures is None:
+            creatures = self.battle.all_creatures()
+        current = {id(c): c for c in creatures}
+        for key, creature in self._followed.items():
+            if key not in current:
+                creature.remove_listener(self._on_creature_event)
+        for key, creature in current.items():
+            if key not in self._followed:
+                creature.add_listener(self._on_creature_event)
+        self._followed = current
+
+    def _on_creature_event(self, event: str, creature):
+        if event == "resistances_changed":
+            resistances = creature.resistances.to_dict(sparse=True)
+            with self._lock:
+                index = self._index.get(id(creature))
+                if index is not None and not self._roster_changed:
+                    self._resistances[index] = resistances
+        else:
+            hp = creature.hp
+            values = (creature.alive, hp.max_hp, hp.real_hp, hp.temp_hp, hp.shield)
+            with self._lock:
+                index = self._index.get(id(creature))
+                if index is not None and not self._roster_changed:
+                    self._hp[index] = values
+
+    def _on_battle_event(self, event: str, battle: Battle):
+        if event in ("creature_added", "creature_removed"):
+            self._follow()
+            with self._lock:
+                self._roster_changed = True
+        elif event in ("initiative_set", "restored"):
+            # Undo/redo notes the creatures it changes with their own events, so
+            # only the turn order needs saving, unless the roster differs
+            current = battle.all_creatures()
+            with self._lock:
+                creatures = self._creatures
+                index = self._index
+                changed = self._roster_changed
+            if changed or len(current) != len(creatures) or any(a is not b for a, b in zip(current, creatures)):
+                self._follow(current)
+                with self._lock:
+                    self._roster_changed = True
+                return
+            layout = battle.layout(index)
+            with self._lock:
+                self._fields.update(layout)
+        elif event in ("turn_advanced", "died", "resurrected"):
+            # Deaths and resurrections in the turn order can move the next turn
+            cursor = battle.cursor()
+            with self._lock:
+                self._fields.update(cursor)
+
+
+def load(path: str, verbose: bool = True) -> Battle:
+    """Rebuild a Battle from an autosave file."""
+    connection = sqlite3.connect(path)
+    try:
+        state = {key: json.loads(value) for key, value in connection.execute("SELECT key, value FROM battle")}
+        if not state:
+            raise ValueError(f"No saved battle in {path!r}.")
+        state["creatures"] = [
+            {"name": name, "alive": bool(alive),
+             "hp": {"max_hp": max_hp, "real_hp": real_hp, "temp_hp": temp_hp, "shield": shield},
+             "stats": json.loads(stats), "resistances": json.loads(resistances)}
+            for name, alive, max_hp, real_hp, temp_hp, shield, stats, resistances
+            in connection.execute("SELECT name, alive, max_hp, real_hp, temp_hp, shield, stats, resistances "
+                                  "FROM creatures ORDER BY idx")]
+    finally:
+        connection.close()
+    return Battle.from_dict(state, verbose)
+
+
+instrumentation.instrument(Autosave, "save")
@@ -1,18 +1,103 @@
+import bisect
+import itertools
 import random
+from array import array
 from typing import List, Tuple
+from characters.batch import damage_many
+from characters import dice, instrumentation
 from characters.creature import Creature
-from team import Team
+from battle_sim.history import SnapshotTracker
+from battle_sim.team import Team
+
+
+class _TurnNode:
+    """Turn order entry, linked into the ring of living creatures while alive."""
+    __slots__ = ("creature", "initiative", "key", "prev_alive", "next_alive", "linked")
+
+    def __init__(self, creature=None, initiative=0, key=None):
+        self.creature = creature
+        self.initiative = initiative
+        self.key = key
+        self.prev_alive = self
+        self.next_alive = self
+        self.linked = False
+
+
+# Faces of a d20, for rolling many at once with Random.choices
+D20 = range(1, 21)
 
 
 class Battle:
-    def __init__(self):
+    def __init__(self, verbose: bool = True, seed=None):
+        self.verbose = verbose
+        # Every roll in the battle comes from its own generator, so a seed replays it exactly
+        self.seed = seed if seed is not None else random.randrange(1 << 63)
+        self.rng = random.Random(self.seed)
         self.teams = []
         self.turn_order = []
+        # Sort keys parallel to turn_order, and each creature's turn node
+        self._turn_keys = []
+        self._nodes = {}
+        self._key_seq = itertools.count()
+        # Ring of living creatures in turn order. _head marks the start of a round,
+        # _next is the node that acts next (_head: a new round starts) and
+        # _alive_keys the sorted keys of the linked nodes.
+        self._head = _TurnNode()
+        self._alive_keys = []
+        self._nodes_by_key = {}
+        self._next = self._head
+        self._active = None
         self.round_number = 1
-        self.current_turn_index = 0
         self._pending_creatures = []
         self.battle_started = False
-        self.active_index = 0
+        # Callbacks taking (event, battle) for battle-level changes
+        self._listeners = []
+        self._snapshots = None
+
+    @property
+    def active_index(self):
+        """Index in turn_order of the creature whose turn it is."""
+        if self._active is None:
+            return 0 if self.round_number == 0 and self.turn_order else None
+        return bisect.bisect_left(self._turn_keys, self._active.key)
+
+    @property
+    def current_turn_index(self):
+        """Index in turn_order of the next living creature to act."""
+        if self._next is self._head:
+            return 0
+        return bisect.bisect_left(self._turn_keys, self._next.key)
+
+    def spawn_seed(self, key) -> str:
+        """Seed of a child stream derived from the battle seed and key, e.g. for a simulation."""
+        return f"{self.seed}:{key}"
+
+    def spawn_rng(self, key) -> random.Random:
+        """Independent generator for the child stream named key."""
+        return random.Random(self.spawn_seed(key))
+
+    def roll_d20s(self, count: int) -> list:
+        """Roll count d20s in one call."""
+        return self.rng.choices(D20, k=count)
+
+    def _log(self, message: str):
+        if self.verbose:
+            print(message)
+
+    # listeners
+    def add_listener(self, listener):
+        """Register a callback(event, battle) for 'creature_added', 'creature_removed',
+        'initiative_set', 'turn_advanced' and 'restored' events. The 'hp_changed',
+        'died' and 'resurrected' events of creatures in the turn order are passed on too."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, event: str):
+        for listener in self._listeners:
+            listener(event, self)
 
     def add_team(self, team, user_input=None):
         """Add a Team to the battle."""
@@ -20,13 +105,19 @@ class Battle:
 
         if self.battle_started:
             for c in team.teammates:
-                self.add_creature(c, user_input)
+                self._add_creature(c, user_input)
+        # One event for the whole team, listeners may rewrite the roster on each
+        self._notify("creature_added")
 
     def add_creature(self, creature, user_input=None):
         """Add a creature to the battle.
         If battle hasn't started, they are added to pending creatures.
         If battle has started, they roll initiative and are inserted into the turn order.
         """
+        self._add_creature(creature, user_input)
+        self._notify("creature_added")
+
+    def _add_creature(self, creature, user_input=None):
         if not hasattr(self, "_pending_creatures"):
             self._pending_creatures = []
         if not hasattr(self, "battle_started"):
@@ -35,17 +126,16 @@ class Battle:
         # Pre-battle
         if not self.battle_started:
             self._pending_creatures.append(creature)
-            print(f"{creature.name} added to pending creatures for battle start.")
+            self._log(f"{creature.name} added to pending creatures for battle start.")
         else:
             # Mid-battle
             if user_input:
                 initiative = int(user_input) + creature.mod("DEX")
             else:
-                initiative = random.randint(1, 20) + creature.mod("DEX")
+                initiative = self.rng.randint(1, 20) + creature.mod("DEX")
 
-            self.turn_order.append((creature, initiative))
-            self._sort_turn_order()
-            print(f"{creature.name} joined battle with initiative {initiative}.")
+            self._insert_turn(creature, initiative)
+            self._log(f"{creature.name} joined battle with initiative {initiative}.")
 
     def get_initiative_list(self):
         """Return a list of (creature, initiative) with initiative 0 if not set."""
@@ -67,33 +157,155 @@ class Battle:
                      If True, uses given initiatives + DEX mod.
         """
         if self.battle_started:
-            print("Battle already started.")
+            self._log("Battle already started.")
             return
 
-        self.turn_order.clear()
+        self._clear_turn_order()
         self.round_number = 0
-        self.current_turn_index = 0
         self.battle_started = True
 
         self._pending_creatures.clear()  # Assuming these have been included in init_list already
 
-        for creature, initiative in init_list:
-            if manual_init:
-                # Use provided initiative + Dex mod
-                init = initiative + creature.mod("DEX")
-            else:
-                # Roll d20 + Dex mod ignoring passed initiative
-                init = random.randint(1, 20) + creature.mod("DEX")
-            self.turn_order.append((creature, init))
+        if manual_init:
+            # Use provided initiative + Dex mod
+            rolls = [initiative for _, initiative in init_list]
+        else:
+            # Roll d20 + Dex mod ignoring passed initiative, the whole roster at once
+            rolls = self.roll_d20s(len(init_list))
+        for (creature, _), roll in zip(init_list, rolls):
+            self.turn_order.append((creature, roll + creature.mod("DEX")))
 
         self._sort_turn_order()
+        self._notify("initiative_set")
+
+    def _turn_key(self, creature, initiative, tiebreak: float = None):
+        """Sort key: initiative, then DEX mod, both descending, then a random tiebreaker.
+
+        The tiebreaker is drawn once per creature, with a sequence number making
+        keys unique, so existing ties never reorder.
+        """
+        if tiebreak is None:
+            tiebreak = self.rng.random()
+        return -initiative, -creature.mod("DEX"), tiebreak, next(self._key_seq)
+
+    def _track(self, creature, initiative, key):
+        """Create the turn node for a creature and follow its deaths and resurrections."""
+        node = _TurnNode(creature, initiative, key)
+        self._nodes[id(creature)] = node
+        self._nodes_by_key[key] = node
+        creature.add_listener(self._on_creature_event)
+        return node
+
+    def _clear_turn_order(self):
+        for node in self._nodes.values():
+            node.creature.remove_listener(self._on_creature_event)
+        self.turn_order.clear()
+        self._turn_keys.clear()
+        self._nodes.clear()
+        self._nodes_by_key.clear()
+        self._alive_keys.clear()
+        self._head.prev_alive = self._head.next_alive = self._head
+        self._next = self._head
+        self._active = None
 
     def _sort_turn_order(self):
-        """Sort turn order by initiative, then DEX mod, then random tiebreaker."""
-        self.turn_order.sort(
-            key=lambda x: (x[1], x[0].mod("DEX"), random.random()),
-            reverse=True
-        )
+        """Sort turn order by initiative, then DEX mod, then random tiebreaker, and relink the living."""
+        keyed = []
+        random_float = self.rng.random
+        for creature, initiative in self.turn_order:
+            node = self._nodes.get(id(creature))
+            if node is None:
+                node = self._track(creature, initiative, self._turn_key(creature, initiative, random_float()))
+            keyed.append((node.key, (creature, initiative)))
+        keyed.sort()
+        self._turn_keys = [key for key, _ in keyed]
+        self.turn_order = [entry for _, entry in keyed]
+
+        # Rebuild the living ring in one pass
+        prev = self._head
+        self._alive_keys = []
+        for key in self._turn_keys:
+            node = self._nodes_by_key[key]
+            node.linked = node.creature.alive
+            if node.linked:
+                self._alive_keys.append(key)
+                node.prev_alive = prev
+                prev.next_alive = node
+                prev = node
+        prev.next_alive = self._head
+        self._head.prev_alive = prev
+
+    def _restore_turn_order(self, turn_order, keys):
+        """Replace the turn order with saved entries and their sort keys."""
+        self._clear_turn_order()
+        for (creature, initiative), key in zip(turn_order, keys):
+            self._track(creature, initiative, key)
+            self.turn_order.append((creature, initiative))
+        self._sort_turn_order()
+
+    def _link(self, node):
+        """Put a living creature back into the ring, between its living neighbours."""
+        if node.linked:
+            return
+        i = bisect.bisect(self._alive_keys, node.key)
+        prev = self._nodes_by_key[self._alive_keys[i - 1]] if i else self._head
+        self._alive_keys.insert(i, node.key)
+        node.prev_alive, node.next_alive = prev, prev.next_alive
+        prev.next_alive.prev_alive = node
+        prev.next_alive = node
+        node.linked = True
+        # Landing right after the active creature makes it the next to act
+        if (self._active is not None and node.next_alive is self._next
+                and node.key > self._active.key):
+            self._next = node
+
+    def _unlink(self, node):
+        """Take a creature out of the ring so turns skip it."""
+        if not node.linked:
+            return
+        if node is self._next:
+            self._next = node.next_alive
+        node.prev_alive.next_alive = node.next_alive
+        node.next_alive.prev_alive = node.prev_alive
+        del self._alive_keys[bisect.bisect_left(self._alive_keys, node.key)]
+        node.linked = False
+
+    def _on_creature_event(self, event: str, creature):
+        node = self._nodes.get(id(creature))
+        if node is None:
+            return
+        if event == "died":
+            self._unlink(node)
+        elif event == "resurrected":
+            self._link(node)
+        elif event != "hp_changed":
+            return
+        self._notify(event)
+
+    def _insert_turn(self, creature, initiative):
+        """Insert one creature into the sorted turn order, keeping the turn cursor in place."""
+        key = self._turn_key(creature, initiative)
+        node = self._track(creature, initiative, key)
+        pos = bisect.bisect(self._turn_keys, key)
+        self._turn_keys.insert(pos, key)
+        self.turn_order.insert(pos, (creature, initiative))
+        if creature.alive:
+            self._link(node)
+
+    def remove_creature(self, creature):
+        """Remove a creature from the turn order, keeping the turn cursor in place."""
+        node = self._nodes.pop(id(creature), None)
+        if node is None:
+            return
+        self._unlink(node)
+        if node is self._active:
+            self._active = None
+        del self._nodes_by_key[node.key]
+        creature.remove_listener(self._on_creature_event)
+        pos = bisect.bisect_left(self._turn_keys, node.key)
+        del self._turn_keys[pos]
+        del self.turn_order[pos]
+        self._notify("creature_removed")
 
     def add_creature_mid_battle(self, creature, manual_initiative: bool = False):
         """Add a single creature to the initiative mid-battle."""
@@ -101,51 +313,152 @@ class Battle:
             roll = int(input(f"Enter your initiative roll for {creature.name}: "))
             initiative = roll + creature.mod("DEX")
         else:
-            initiative = random.randint(1, 20) + creature.mod("DEX")
+            initiative = self.rng.randint(1, 20) + creature.mod("DEX")
 
-        self.turn_order.append((creature, initiative))
-        self._sort_turn_order()
+        self._insert_turn(creature, initiative)
+        self._notify("creature_added")
 
     def add_team_mid_battle(self, team, manual_initiative: bool = False):
         """Add a full team to the initiative mid-battle."""
-        for creature in team:
-            if manual_initiative:
-                roll = int(input(f"Enter your initiative roll for {creature.name}: "))
-                initiative = roll + creature.mod("DEX")
-            else:
-                initiative = random.randint(1, 20) + creature.mod("DEX")
+        if manual_initiative:
+            rolls = [int(input(f"Enter your initiative roll for {creature.name}: ")) for creature in team]
+        else:
+            rolls = self.roll_d20s(len(team))
 
-            self.turn_order.append((creature, initiative))
-        self._sort_turn_order()
+        for creature, roll in zip(team, rolls):
+            self._insert_turn(creature, roll + creature.mod("DEX"))
+        self._notify("creature_added")
 
     def next_turn(self):
         """Return (round_number, creature, initiative) and advance turn."""
         if not self.turn_order:
             raise ValueError("No turn order — did you run roll_initiative()?")
 
-        for _ in range(len(self.turn_order)):
-            idx = self.current_turn_index
-            creature, initiative = self.turn_order[idx]
-
-            self.active_index = idx
-
-            # Advance turn index for next call
-            self.current_turn_index += 1
-            if self.current_turn_index >= len(self.turn_order):
-                self.current_turn_index = 0
-
-            if self.active_index == 0:
-                self.round_number += 1
-
-            if not creature.alive:
-                print(f"{creature.name} is dead and skips their turn.")
-                continue
-            else:
-                return self.round_number, creature, initiative
-
-        print("All creatures are dead — battle over.")
-        self.active_index = None
-        return None, None, None
+        # Dead creatures are not in the ring, so this never walks past them
+        node = self._next
+        if node is self._head:
+            self.round_number += 1
+            node = node.next_alive
+
+        if node is self._head:
+            self._log("All creatures are dead — battle over.")
+            self._active = None
+            return None, None, None
+
+        self._active = node
+        self._next = node.next_alive
+        self._notify("turn_advanced")
+        return self.round_number, node.creature, node.initiative
+
+    def apply_area_damage(self, targets, amount, damage_type: str = "true",
+                          save_stat: str = None, dc: int = None):
+        """Deal area damage to many creatures in one pass.
+
+        amount is a number or a dice expression such as "8d6", rolled once for
+        all targets with the battle's generator. If save_stat and dc are given,
+        every target rolls d20 + save_stat mod against dc and takes half damage
+        (rounded down) on a success.
+        Returns a BatchDamageResult with one column entry per target.
+        """
+        amount = dice.roll(amount, self.rng)
+        targets = list(targets)
+        saved = array("b", bytes(len(targets)))
+        if save_stat is not None and dc is not None:
+            for i, (creature, roll) in enumerate(zip(targets, self.roll_d20s(len(targets)))):
+                saved[i] = roll + creature.mod(save_stat) >= dc
+
+        half = amount // 2
+        amounts = [half if s else amount for s in saved]
+        return damage_many(targets, amounts, damage_type, saved)
+
+    # ----- Snapshots -----
+    def snapshot(self):
+        """Capture turn order, round, turn cursor and every creature's HP, alive flag
+        and resistances. Parts unchanged since the previous snapshot are shared."""
+        if self._snapshots is None:
+            self._snapshots = SnapshotTracker(self)
+        return self._snapshots.snapshot()
+
+    def restore(self, snapshot):
+        """Return the battle to a snapshot taken with snapshot()."""
+        if self._snapshots is None:
+            self._snapshots = SnapshotTracker(self)
+        self._snapshots.restore(snapshot)
+        self._notify("restored")
+
+    # ----- Serialization -----
+    def all_creatures(self):
+        """Return every creature in the battle once: team members, pending, then turn order."""
+        seen = {}
+        for team in self.teams:
+            for c in team:
+                seen.setdefault(id(c), c)
+        for c in self._pending_creatures:
+            seen.setdefault(id(c), c)
+        for c, _ in self.turn_order:
+            seen.setdefault(id(c), c)
+        return list(seen.values())
+
+    def to_dict(self, sparse: bool = False):
+        """Convert the battle state to a plain dictionary.
+
+        Creatures are stored once and referenced by index. Turn order entries are
+        [creature, initiative, DEX mod, tiebreaker], and "active" and "next" are
+        positions in the turn order (None before the first turn or at a round's end).
+        """
+        creatures = self.all_creatures()
+        index = {id(c): i for i, c in enumerate(creatures)}
+        return {"creatures": [c.to_dict(sparse) for c in creatures], **self.layout(index)}
+
+    def layout(self, index: dict) -> dict:
+        """Everything to_dict stores besides the creatures themselves, which are
+        referenced through index ({id(creature): position in "creatures"})."""
+        return {
+            "teams": [{"team name": team.name, "members": [index[id(c)] for c in team]}
+                      for team in self.teams],
+            "pending": [index[id(c)] for c in self._pending_creatures],
+            "turn_order": [[index[id(c)], initiative, -key[1], key[2]]
+                           for (c, initiative), key in zip(self.turn_order, self._turn_keys)],
+            "battle_started": self.battle_started,
+            **self.cursor(),
+        }
+
+    def cursor(self) -> dict:
+        """The round number and the "active" and "next" turn order positions, as stored by to_dict."""
+        return {
+            "round_number": self.round_number,
+            "active": None if self._active is None else self.active_index,
+            "next": None if self._next is self._head else self.current_turn_index,
+        }
+
+    @classmethod
+    def from_dict(cls, data, verbose: bool = True):
+        battle = cls(verbose)
+        creatures = [Creature.from_dict(cd) for cd in data["creatures"]]
+        battle.teams = [Team(td["team name"], [creatures[i] for i in td["members"]])
+                        for td in data["teams"]]
+        battle._pending_creatures = [creatures[i] for i in data["pending"]]
+        battle.round_number = data["round_number"]
+        battle.battle_started = data["battle_started"]
+
+        entries = data["turn_order"]
+        for pos, (i, initiative, dex_mod, tiebreak) in enumerate(entries):
+            if tiebreak is None:
+                # Unknown tiebreaker: keep the stored order among ties
+                tiebreak = pos / len(entries)
+            key = (-initiative, -dex_mod, tiebreak, next(battle._key_seq))
+            battle._track(creatures[i], initiative, key)
+            battle.turn_order.append((creatures[i], initiative))
+        battle._sort_turn_order()
+
+        nodes = [battle._nodes_by_key[key] for key in battle._turn_keys]
+        if data.get("active") is not None:
+            battle._active = nodes[data["active"]]
+        if data.get("next") is not None:
+            # The next creature may have died since; move on to the first living one
+            living = [node for node in nodes[data["next"]:] if node.linked]
+            battle._next = living[0] if living else battle._head
+        return battle
 
     def print_turn_order(self):
         """Debug: show initiative order."""
@@ -154,6 +467,10 @@ class Battle:
             print(f"{c} - Initiative: {init}, DEX mod: {c.mod('DEX')}")
 
 
+instrumentation.instrument(Battle, "next_turn", "_sort_turn_order", "set_initiative", "apply_area_damage",
+                           "to_dict", "from_dict")
+
+
 if __name__ == '__main__':
     c1 = Creature("a")
     c2 = Creature("b")
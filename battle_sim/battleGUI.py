@@ -1,18 +1,44 @@
+import threading
 import tkinter as tk
-from tkinter import simpledialog, messagebox
-from battle import Battle
+from tkinter import simpledialog, messagebox, ttk
+from battle_sim import TEAMS_FOLDER
+from battle_sim import autosave
+from battle_sim.battle import Battle
+from characters import dice
 from characters.creature import Creature
-from team import Team
+from battle_sim.history import BattleHistory
+from battle_sim.journal import CombatJournal, replay
+from battle_sim.library import TeamLibrary
+from battle_sim.simulation import Simulation
+from battle_sim.tasks import BackgroundRunner
+from battle_sim.turn_view import TurnOrderView
 import os
 
 
 class BattleGUI:
-    TEAMS_FOLDER = "teams"
+    TEAMS_FOLDER = TEAMS_FOLDER
+    # Initiative d20s rolled between progress updates
+    INITIATIVE_CHUNK = 10000
 
-    def __init__(self, root, battle):
+    def __init__(self, root, battle, journal_path=None, autosave_path=None):
         self.battle = battle
         self.root = root
+        # Every change is journaled, so a crash loses at most the last record
+        self.journal = CombatJournal(battle, journal_path) if journal_path else None
+        # Or saved on a timer, so a crash loses at most the last few seconds
+        self.autosave = None
+        if autosave_path:
+            self.autosave = autosave.Autosave(battle, autosave_path)
+            self.autosave.start()
         self.root.title("DnD Battle Simulator")
+        self.team_library = TeamLibrary(self.TEAMS_FOLDER)
+        self.history = BattleHistory(battle)
+        self.history.checkpoint()
+        self.runner = BackgroundRunner(root)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        # Battle events only mark the view dirty, one redraw runs once Tk is idle
+        self._redraw_pending = False
+        battle.add_listener(self._on_battle_event)
 
         self.add_creature_btn = tk.Button(root, text="Add Creature", command=lambda: self.add_creature(True))
         self.add_creature_btn.pack()
@@ -20,11 +46,11 @@ class BattleGUI:
         self.roll_init_btn = tk.Button(root, text="Roll Initiative", command=lambda: self.roll_initiative(True))
         self.roll_init_btn.pack()
 
-        self.turn_order_text = tk.Text(root, height=10, width=40)
-        self.turn_order_text.tag_configure("round", font=("Courier New", 10, "bold"))
-        self.turn_order_text.tag_configure("active", foreground="red", font=("Courier New", 10, "bold"))
-        self.turn_order_text.tag_configure("normal", foreground="black", font=("Courier New", 10))
-        self.turn_order_text.pack()
+        self.auto_init_btn = tk.Button(root, text="Auto Initiative", command=lambda: self.roll_initiative(False))
+        self.auto_init_btn.pack()
+
+        self.turn_view = TurnOrderView(root, battle)
+        self.turn_view.pack()
 
         self.next_turn_btn = tk.Button(root, text="Next Turn", command=self.next_turn)
         self.next_turn_btn.pack()
@@ -35,6 +61,97 @@ class BattleGUI:
         self.interact_btn = tk.Button(root, text="Interact", command=self.interact_with_creature)
         self.interact_btn.pack()
 
+        self.undo_btn = tk.Button(root, text="Undo", command=self.undo)
+        self.undo_btn.pack()
+
+        self.redo_btn = tk.Button(root, text="Redo", command=self.redo)
+        self.redo_btn.pack()
+
+        self.simulate_btn = tk.Button(root, text="Simulate", command=self.simulate)
+        self.simulate_btn.pack()
+
+        self.status = tk.Frame(root)
+        self.status_label = tk.Label(self.status, text="")
+        self.status_label.pack(side="left")
+        self.progress = ttk.Progressbar(self.status, length=150)
+        self.progress.pack(side="left", padx=5)
+        self.cancel_btn = tk.Button(self.status, text="Cancel", command=self.runner.cancel_all)
+        self.cancel_btn.pack(side="left")
+
+        # Disabled while a background task owns the battle
+        self.task_buttons = [self.add_creature_btn, self.roll_init_btn, self.auto_init_btn, self.next_turn_btn,
+                             self.load_team_btn, self.interact_btn, self.undo_btn, self.redo_btn,
+                             self.simulate_btn]
+
+        # A battle resumed from a journal already has a turn order to show
+        self.request_redraw()
+
+    def _on_battle_event(self, event: str, battle):
+        # Background tasks change the battle off the main thread, they redraw when done
+        if threading.current_thread() is threading.main_thread():
+            self.request_redraw()
+
+    def request_redraw(self):
+        """Schedule one turn order redraw for however many changes happen before Tk is idle."""
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.root.after_idle(self.show_turn_order)
+
+    def close(self):
+        self.runner.shutdown()
+        if self.journal is not None:
+            self.journal.close()
+        if self.autosave is not None:
+            self.autosave.close()
+        self.root.destroy()
+
+    def run_task(self, label, work, on_done, error_title="Error"):
+        """Run work(task) on a worker thread with the progress bar shown and the
+        action buttons disabled. on_done(result) runs back on the main thread."""
+        def finish():
+            self.request_redraw()
+            self.status.pack_forget()
+            self.progress.stop()
+            for button in self.task_buttons:
+                button.config(state="normal")
+
+        def done(result):
+            finish()
+            on_done(result)
+
+        def error(e):
+            finish()
+            messagebox.showerror(error_title, f"{label} failed: \n{e}")
+
+        def cancelled():
+            finish()
+            messagebox.showinfo("Cancelled", f"{label} cancelled.")
+
+        for button in self.task_buttons:
+            button.config(state="disabled")
+        self.status_label.config(text=f"{label}...")
+        self.progress.config(mode="indeterminate", value=0)
+        self.progress.start()
+        self.status.pack(pady=5)
+        self.runner.submit(label, work, on_done=done, on_error=error, on_cancel=cancelled,
+                           on_progress=self.show_progress)
+
+    def show_progress(self, task):
+        if task.total:
+            self.progress.stop()
+            self.progress.config(mode="determinate", maximum=task.total, value=task.done)
+            self.status_label.config(text=f"{task.label}... {task.done}/{task.total}")
+
+    def undo(self):
+        if not self.history.undo():
+            messagebox.showinfo("Undo", "Nothing to undo.")
+            return
+
+    def redo(self):
+        if not self.history.redo():
+            messagebox.showinfo("Redo", "Nothing to redo.")
+            return
+
     def add_creature(self, manual_init: bool = False):
         name = simpledialog.askstring("Input", "Creature name:")
         if name:
@@ -50,11 +167,9 @@ class BattleGUI:
                 int(user_input)
 
             self.battle.add_creature(c, user_input)
+            self.history.checkpoint()
             messagebox.showinfo("Added", f"{name} added.")
 
-            if self.battle.battle_started:
-                self.show_turn_order()
-
     def roll_initiative(self, manual_init: bool = False):
         # Get creatures with default 0 initiatives
         init_rolls = self.battle.get_initiative_list()
@@ -82,41 +197,54 @@ class BattleGUI:
 
             root.destroy()
 
-        # Set initiatives
-        self.battle.set_initiative(init_rolls, manual_init=manual_init)
-
-        self.show_turn_order()
-
-    def show_turn_order(self):
-        if not self.battle.turn_order:
-            self.turn_order_text.config(state="normal")
-            self.turn_order_text.delete("1.0", "end")
-            self.turn_order_text.insert("end", "No turn order set.", "normal")
-            self.turn_order_text.config(state="disabled")
+        if manual_init:
+            self.battle.set_initiative(init_rolls, manual_init=True)
+            self.history.checkpoint()
+        else:
+            # The d20s are rolled on a worker, in chunks so Cancel takes effect. The
+            # turn order is only changed in rolled(), back on the main thread, as
+            # the turn view reads it whenever it scrolls.
+            def roll(task):
+                rolls = []
+                total = len(init_rolls)
+                while len(rolls) < total:
+                    rolls.extend(self.battle.roll_d20s(min(self.INITIATIVE_CHUNK, total - len(rolls))))
+                    task.progress(len(rolls), total)
+                return rolls
+
+            def rolled(rolls):
+                self.battle.set_initiative([(c, r) for (c, _), r in zip(init_rolls, rolls)], manual_init=True)
+                self.history.checkpoint()
+
+            self.run_task("Rolling initiative", roll, rolled)
+
+    def simulate(self):
+        if len(self.battle.teams) < 2:
+            messagebox.showerror("Error", "Load at least two teams to simulate.")
+            return
+        runs = simpledialog.askinteger("Simulate", "Number of battles:", initialvalue=1000, minvalue=1)
+        if not runs:
             return
 
-        self.turn_order_text.config(state="normal")
-        self.turn_order_text.delete("1.0", "end")
-
-        # Header with round number
-        self.turn_order_text.insert("end", f"=== Round {self.battle.round_number} ===\n", "round")
+        simulation = Simulation(self.battle.teams, seed=self.battle.spawn_seed("simulation"))
 
-        max_name_len = max(len(c.name) for c, _ in self.battle.turn_order)
+        def show_result(result):
+            lines = [f"{name}: {rate:.1%}" for name, rate in result.win_rates().items() if name is not None]
+            lines.append(f"Draw: {result.win_rates()[None]:.1%}")
+            lines.append(f"Mean rounds: {result.mean_rounds():.2f}")
+            messagebox.showinfo("Simulation", "\n".join(lines))
 
-        for idx, (creature, initiative) in enumerate(self.battle.turn_order, start=1):
-            line = (f"{idx:2}. {creature.name.ljust(max_name_len)}   Init: {initiative} HP: {creature.hp.real_hp}"
-                    f"/{creature.hp.max_hp}\n")
-            if idx - 1 == self.battle.active_index:
-                self.turn_order_text.insert("end", line, "active")
-            else:
-                self.turn_order_text.insert("end", line, "normal")
+        self.run_task("Simulating", lambda task: simulation.run(runs, progress=task.progress), show_result,
+                      "Simulation Error")
 
-        self.turn_order_text.config(state="disabled")
+    def show_turn_order(self):
+        self._redraw_pending = False
+        self.turn_view.refresh()
 
     def next_turn(self):
         round_num, creature, init = self.battle.next_turn()
+        self.history.checkpoint()
         messagebox.showinfo("Next Turn", f"It's {creature.name}'s turn of {init}!")
-        self.show_turn_order()
 
     def interact_with_creature(self):
         if not self.battle.turn_order:
@@ -165,7 +293,7 @@ class BattleGUI:
 
         def attack():
             try:
-                dmg_value = int(simpledialog.askstring("Attack", "Enter damage value:"))
+                dmg_dice = dice.parse(simpledialog.askstring("Attack", "Enter damage (e.g. 12 or 2d6+3):"))
             except (TypeError, ValueError):
                 messagebox.showerror("Error", "Invalid damage value.")
                 return
@@ -174,8 +302,8 @@ class BattleGUI:
             if not dmg_type:
                 return
 
-            result = target.damage(dmg_value, dmg_type)
-            self.show_turn_order()
+            result = target.damage(dmg_dice.roll(self.battle.rng), dmg_type)
+            self.history.checkpoint()
 
             # Interpret the result
             if result.get("healed_instead", False):
@@ -183,7 +311,9 @@ class BattleGUI:
                        f"for {result['heal_amount']} HP (now at {result['remaining_hp']} HP).")
             else:
                 absorbed = result.get("absorbed_by_shield", 0)
-                msg = (f"{result['target']} took {result['final_amount']} {dmg_type} damage")
+                msg = f"{result['target']} took {result['final_amount']} {dmg_type} damage"
+                if dmg_dice.terms:
+                    msg += f" (rolled {result['initial_amount']} on {dmg_dice})"
                 if absorbed > 0:
                     msg += f" ({absorbed} absorbed by shield)"
                 msg += f". {result['remaining_hp']} HP left."
@@ -201,7 +331,7 @@ class BattleGUI:
                 return
 
             result = target.heal(heal_value)
-            self.show_turn_order()
+            self.history.checkpoint()
 
             msg = (f"{result['target']} healed for {result['healed_amount']} HP "
                    f"(now at {result['remaining_hp']} HP).")
@@ -210,13 +340,13 @@ class BattleGUI:
 
         def resurrect():
             target.resurrect()
-            self.show_turn_order()
+            self.history.checkpoint()
             messagebox.showinfo("Done", f"{target.name} has been resurrected.")
             action_popup.destroy()
 
         def kill():
             target.die()
-            self.show_turn_order()
+            self.history.checkpoint()
             messagebox.showinfo("Done", f"{target.name} has been killed.")
             action_popup.destroy()
 
@@ -234,9 +364,12 @@ class BattleGUI:
             messagebox.showerror("Error", f"Teams folder '{self.TEAMS_FOLDER}' not found.")
             return None
 
-        # List JSON files in Teams folder
-        files = [f for f in os.listdir(self.TEAMS_FOLDER) if f.endswith(".json")]
-        if not files:
+        # Files new since the last listing are indexed on a worker
+        self.run_task("Listing teams", lambda task: self.team_library.entries(progress=task.progress),
+                      self.choose_team, "Load Error")
+
+    def choose_team(self, entries):
+        if not entries:
             messagebox.showinfo("No Teams", "No team files found in the Teams folder.")
             return None
 
@@ -250,8 +383,8 @@ class BattleGUI:
         label.pack(pady=5)
 
         listbox = tk.Listbox(top, height=10)
-        for file in files:
-            listbox.insert(tk.END, file)
+        for entry in entries:
+            listbox.insert(tk.END, f"{entry.filename} ({entry.team_name or '?'}, {entry.member_count})")
         listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
 
         selected_team = {"filename": None}
@@ -261,7 +394,7 @@ class BattleGUI:
             if not selection:
                 messagebox.showwarning("No Selection", "Please select a team before loading.")
                 return
-            selected_team["filename"] = listbox.get(selection[0])
+            selected_team["filename"] = entries[selection[0]].filename
             top.destroy()
 
         load_btn = tk.Button(top, text="Load Selected Team", command=on_load)
@@ -274,19 +407,31 @@ class BattleGUI:
             messagebox.showinfo("Cancelled", "No team selected.")
             return None
 
-        team_path = os.path.join(self.TEAMS_FOLDER, selected_team["filename"])
-        try:
-            team = Team.load(team_path)
-            messagebox.showinfo("Success", f"Team '{selected_team['filename']}' loaded successfully.")
+        filename = selected_team["filename"]
+
+        def loaded(team):
             self.battle.add_team(team)
-        except Exception as e:
-            messagebox.showerror("Load Error", f"Failed to load team: \n{e}")
-            return None
+            self.history.checkpoint()
+            messagebox.showinfo("Success", f"Team '{filename}' loaded successfully.")
 
+        # Parsing big rosters happens on a worker, the battle is touched only in loaded()
+        self.run_task(f"Loading {filename}", lambda task: self.team_library.load(filename, progress=task.progress),
+                      loaded, "Load Error")
 
-# Assuming you have a Battle class already
-if __name__ == "__main__":
+
+def main(seed=None, journal=None, autosave_path=None):
+    """Open the GUI. With a journal or autosave path, the battle is saved there,
+    and a battle already saved at that path is loaded first to resume it."""
     root = tk.Tk()
-    battle = Battle()
-    gui = BattleGUI(root, battle)
-    root.mainloop()
\ No newline at end of file
+    if journal is not None and os.path.exists(journal + ".snapshot"):
+        battle = replay(journal)
+    elif autosave_path is not None and os.path.exists(autosave_path):
+        battle = autosave.load(autosave_path)
+    else:
+        battle = Battle(seed=seed)
+    gui = BattleGUI(root, battle, journal, autosave_path)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
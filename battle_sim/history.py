@@ -0,0 +1,219 @@
+from typing import NamedTuple
+from characters.hp import HP
+from characters.resistances import Resistances
+
+# Creature records are grouped in fixed-size chunks, so a snapshot only
+# rebuilds the chunks holding creatures that changed since the last one.
+CHUNK_SIZE = 32
+
+
+class BattleSnapshot(NamedTuple):
+    """Immutable battle state. Unchanged parts are shared with earlier snapshots."""
+    creatures: tuple     # roster, in Battle.all_creatures() order
+    chunks: tuple        # per-creature (max, real, temp, shield, alive, resistance profile) records;
+                         # the profile is the raw dict for resistances not built yet
+    roster: tuple        # ((team, members), ...)
+    pending: tuple       # creatures waiting for initiative
+    order: tuple         # turn_order, sort keys
+    battle_started: bool
+    round_number: int
+    active_key: tuple
+    next_key: tuple
+
+
+def _record(creature) -> tuple:
+    # Parts of a lazily loaded creature that haven't been built are read from their
+    # raw dicts, so snapshots don't build them
+    raw_hp = creature.raw_part("hp")
+    hp = creature.hp if raw_hp is None else HP.from_dict(raw_hp)
+    profile = creature.raw_part("resistances")
+    if profile is None:
+        profile = creature.resistances.profile
+    return hp.max_hp, hp.real_hp, hp.temp_hp, hp.shield, creature.alive, profile
+
+
+def _apply(creature, record: tuple):
+    max_hp, real_hp, temp_hp, shield, alive, profile = record
+    if alive != creature.alive:
+        if alive:
+            creature.resurrect()
+        else:
+            creature.die()
+    hp = creature.hp
+    hp.max_hp, hp.real_hp, hp.temp_hp, hp.shield = max_hp, real_hp, temp_hp, shield
+    if isinstance(profile, dict):
+        if creature.raw_part("resistances") is not profile:
+            creature.resistances = Resistances.from_dict(profile)
+            creature._notify("resistances_changed")
+    elif creature.resistances.profile is not profile:
+        creature.resistances.profile = profile
+        creature._notify("resistances_changed")
+    creature._notify("hp_changed")
+
+
+class SnapshotTracker:
+    """Builds copy-on-write snapshots of a battle.
+
+    Follows creature events to know which records are dirty, so taking a
+    snapshot costs the number of changed creatures plus one pointer per chunk,
+    not a copy of the roster. The roster and turn order are copied only after
+    creatures join or leave or initiative is rolled.
+    """
+
+    def __init__(self, battle):
+        self.battle = battle
+        self._creatures = ()
+        self._index = {}
+        self._chunks = []
+        self._dirty = set()
+        self._roster = None
+        self._pending = None
+        self._order = None
+        self._roster_stale = True
+        self._order_stale = True
+        battle.add_listener(self._on_battle_event)
+
+    def _on_battle_event(self, event: str, battle):
+        if event in ("creature_added", "creature_removed", "initiative_set"):
+            self._roster_stale = True
+            self._order_stale = True
+
+    def _on_creature_event(self, event: str, creature):
+        index = self._index.get(id(creature))
+        if index is not None:
+            self._dirty.add(index)
+
+    def _rebuild_roster(self):
+        for creature in self._creatures:
+            creature.remove_listener(self._on_creature_event)
+        self._creatures = tuple(self.battle.all_creatures())
+        self._index = {id(c): i for i, c in enumerate(self._creatures)}
+        for creature in self._creatures:
+            creature.add_listener(self._on_creature_event)
+
+        self._chunks = [tuple(_record(c) for c in self._creatures[start:start + CHUNK_SIZE])
+                        for start in range(0, len(self._creatures), CHUNK_SIZE)]
+        self._roster = tuple((team, tuple(team)) for team in self.battle.teams)
+        self._pending = tuple(self.battle._pending_creatures)
+        self._dirty.clear()
+        self._roster_stale = False
+
+    def snapshot(self) -> BattleSnapshot:
+        battle = self.battle
+        if self._roster_stale:
+            self._rebuild_roster()
+        elif self._dirty:
+            for chunk in {index // CHUNK_SIZE for index in self._dirty}:
+                start = chunk * CHUNK_SIZE
+                self._chunks[chunk] = tuple(_record(c) for c in self._creatures[start:start + CHUNK_SIZE])
+            self._dirty.clear()
+
+        if self._order_stale:
+            self._order = (tuple(battle.turn_order), tuple(battle._turn_keys))
+            self._order_stale = False
+
+        return BattleSnapshot(
+            creatures=self._creatures,
+            chunks=tuple(self._chunks),
+            roster=self._roster,
+            pending=self._pending,
+            order=self._order,
+            battle_started=battle.battle_started,
+            round_number=battle.round_number,
+            active_key=None if battle._active is None else battle._active.key,
+            next_key=None if battle._next is battle._head else battle._next.key,
+        )
+
+    def restore(self, snapshot: BattleSnapshot):
+        """Bring the battle back to a snapshot, touching only what differs."""
+        battle = self.battle
+        current = self.snapshot()
+
+        if snapshot.roster is not current.roster:
+            battle.teams = [team for team, _ in snapshot.roster]
+            for team, members in snapshot.roster:
+                if tuple(team) != members:
+                    for creature in list(team):
+                        team.remove_creature(creature)
+                    for creature in members:
+                        team.add_creature(creature)
+        if snapshot.pending is not current.pending:
+            battle._pending_creatures = list(snapshot.pending)
+
+        same_roster = snapshot.creatures is current.creatures
+        for chunk, (records, current_records) in enumerate(zip(snapshot.chunks, current.chunks)):
+            if same_roster and records is current_records:
+                continue
+            start = chunk * CHUNK_SIZE
+            for creature, record, current_record in zip(snapshot.creatures[start:start + CHUNK_SIZE],
+                                                         records, current_records):
+                if not same_roster or record is not current_record:
+                    _apply(creature, record)
+        if not same_roster:
+            # Chunks past the end of the current roster
+            for chunk in range(len(current.chunks), len(snapshot.chunks)):
+                start = chunk * CHUNK_SIZE
+                for creature, record in zip(snapshot.creatures[start:start + CHUNK_SIZE], snapshot.chunks[chunk]):
+                    _apply(creature, record)
+
+        if snapshot.order is not current.order:
+            battle._restore_turn_order(*snapshot.order)
+
+        # Undoing the initiative roll lets it be rolled again
+        battle.battle_started = snapshot.battle_started
+        battle.round_number = snapshot.round_number
+        battle._active = battle._nodes_by_key.get(snapshot.active_key)
+        battle._next = battle._nodes_by_key.get(snapshot.next_key, battle._head)
+
+        # The battle now matches the snapshot, share its parts again
+        if snapshot.creatures is not self._creatures:
+            for creature in self._creatures:
+                creature.remove_listener(self._on_creature_event)
+            self._creatures = snapshot.creatures
+            self._index = {id(c): i for i, c in enumerate(self._creatures)}
+            for creature in self._creatures:
+                creature.add_listener(self._on_creature_event)
+        self._chunks = list(snapshot.chunks)
+        self._roster = snapshot.roster
+        self._pending = snapshot.pending
+        self._order = snapshot.order
+        self._dirty.clear()
+        self._roster_stale = False
+        self._order_stale = False
+
+
+class BattleHistory:
+    """Undo/redo over battle snapshots. Call checkpoint() after every action."""
+
+    def __init__(self, battle, limit: int = 200):
+        self.battle = battle
+        self.limit = limit
+        self._undo = []
+        self._redo = []
+
+    def checkpoint(self):
+        self._undo.append(self.battle.snapshot())
+        if len(self._undo) > self.limit:
+            del self._undo[0]
+        self._redo.clear()
+
+    def can_undo(self) -> bool:
+        return len(self._undo) > 1
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def undo(self) -> bool:
+        if not self.can_undo():
+            return False
+        self._redo.append(self._undo.pop())
+        self.battle.restore(self._undo[-1])
+        return True
+
+    def redo(self) -> bool:
+        if not self._redo:
+            return False
+        snapshot = self._redo.pop()
+        self.battle.restore(snapshot)
+        self._undo.append(snapshot)
+        return True
@@ -0,0 +1,173 @@
+import json
+import os
+import struct
+from battle_sim.battle import Battle
+
+# Fixed-size record: opcode, creature index, then up to four values
+RECORD = struct.Struct("<BIiiii")
+
+HP = 1                 # max_hp, real_hp, temp_hp, shield after the change
+DIE = 2
+RESURRECT = 3          # real_hp after resurrection
+INITIATIVE_RESET = 4   # initiative roll number: clear the turn order
+INITIATIVE = 5         # initiative, position in the turn order, DEX mod, initiative roll number
+TURN = 6               # round number, active position, next position (-1 for none)
+
+
+class CombatJournal:
+    """Append-only journal of a battle, with periodic snapshots.
+
+    Every HP change, death, resurrection, initiative roll and turn advance is
+    appended to the journal file as a fixed-size binary record, along with the
+    turn cursor whenever a death or resurrection moves it. A JSON snapshot
+    of the whole battle is written next to it (path + ".snapshot") on attach,
+    every snapshot_interval records, whenever creatures join or leave and after
+    the battle is restored to an earlier state. It stores how many records it
+    already covers, so recovery loads the latest snapshot and replays only the
+    records after it.
+    """
+
+    def __init__(self, battle: Battle, path: str, snapshot_interval: int = 1000):
+        self.battle = battle
+        self.path = path
+        self.snapshot_path = path + ".snapshot"
+        self.snapshot_interval = snapshot_interval
+
+        self._file = open(path, "ab")
+        size = self._file.tell()
+        if size % RECORD.size:
+            # Drop a record torn by a crash
+            size -= size % RECORD.size
+            self._file.truncate(size)
+        self.records = size // RECORD.size
+        self._since_snapshot = 0
+        # Numbers each initiative roll, so replay can tell a turn order the
+        # snapshot already holds from one it still has to rebuild
+        self._initiative_seq = 0
+        # Set while a block of records that belongs together is written
+        self._in_block = False
+        self._creatures = []
+        self._index = {}
+
+        battle.add_listener(self._on_battle_event)
+        self.snapshot()
+
+    def snapshot(self):
+        """Write the full battle state, marking the records it already includes."""
+        self._file.flush()
+        state = self.battle.to_dict(sparse=True)
+        state["journal_offset"] = self.records
+        state["initiative_seq"] = self._initiative_seq
+
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        # Records refer to creatures by their index in the latest snapshot
+        for creature in self._creatures:
+            creature.remove_listener(self._on_creature_event)
+        self._creatures = self.battle.all_creatures()
+        self._index = {id(c): i for i, c in enumerate(self._creatures)}
+        for creature in self._creatures:
+            creature.add_listener(self._on_creature_event)
+        self._since_snapshot = 0
+
+    def close(self):
+        self.battle.remove_listener(self._on_battle_event)
+        for creature in self._creatures:
+            creature.remove_listener(self._on_creature_event)
+        self._file.close()
+
+    def _append(self, op: int, index: int = 0, a: int = 0, b: int = 0, c: int = 0, d: int = 0):
+        self._file.write(RECORD.pack(op, index, a, b, c, d))
+        self._file.flush()
+        self.records += 1
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_interval and not self._in_block:
+            self.snapshot()
+
+    def _on_creature_event(self, event: str, creature):
+        index = self._index.get(id(creature))
+        if index is None:
+            return
+        hp = creature.hp
+        if event == "hp_changed":
+            self._append(HP, index, hp.max_hp, hp.real_hp, hp.temp_hp, hp.shield)
+        elif event == "died":
+            self._append(DIE, index)
+        elif event == "resurrected":
+            self._append(RESURRECT, index, hp.real_hp)
+
+    def _on_battle_event(self, event: str, battle: Battle):
+        if event in ("creature_added", "creature_removed", "restored"):
+            self.snapshot()
+        elif event == "initiative_set":
+            if any(id(c) not in self._index for c, _ in battle.turn_order):
+                self.snapshot()
+                return
+            self._initiative_seq += 1
+            seq = self._initiative_seq
+            # A snapshot halfway through would already hold the whole new order
+            self._in_block = True
+            try:
+                self._append(INITIATIVE_RESET, 0, seq)
+                for pos, (c, initiative) in enumerate(battle.turn_order):
+                    self._append(INITIATIVE, self._index[id(c)], initiative, pos, c.mod("DEX"), seq)
+            finally:
+                self._in_block = False
+            if self._since_snapshot >= self.snapshot_interval:
+                self.snapshot()
+        elif event in ("turn_advanced", "died", "resurrected"):
+            # Deaths and resurrections in the turn order can move the next turn
+            active = battle.active_index
+            nxt = -1 if battle._next is battle._head else battle.current_turn_index
+            self._append(TURN, 0, battle.round_number, -1 if active is None else active, nxt)
+
+
+def _apply(state: dict, op: int, index: int, a: int, b: int, c: int, d: int):
+    """Apply one journal record to a battle state dict."""
+    if op == HP:
+        state["creatures"][index]["hp"] = {"max_hp": a, "real_hp": b, "temp_hp": c, "shield": d}
+    elif op == DIE:
+        state["creatures"][index]["alive"] = False
+        state["creatures"][index]["hp"]["real_hp"] = 0
+    elif op == RESURRECT:
+        state["creatures"][index]["alive"] = True
+        state["creatures"][index]["hp"]["real_hp"] = a
+    elif op == INITIATIVE_RESET:
+        # Rolls the snapshot already includes are skipped, with their INITIATIVE records
+        if a > state["initiative_seq"]:
+            state.update(turn_order=[], pending=[], round_number=0, battle_started=True,
+                         active=None, next=None, initiative_seq=a, initiative_open=True)
+    elif op == INITIATIVE:
+        if d == state["initiative_seq"] and state.get("initiative_open"):
+            # The tiebreaker isn't journaled; the stored position keeps the order
+            state["turn_order"].insert(b, [index, a, c, None])
+    elif op == TURN:
+        state["round_number"] = a
+        state["active"] = None if b < 0 else b
+        state["next"] = None if c < 0 else c
+    else:
+        raise ValueError(f"Unknown journal record: {op}")
+
+
+def replay(path: str, verbose: bool = True) -> Battle:
+    """Rebuild a Battle from its latest snapshot and the journal records after it."""
+    with open(path + ".snapshot", "r", encoding="utf-8") as f:
+        state = json.load(f)
+    offset = state.pop("journal_offset")
+    state.setdefault("initiative_seq", 0)
+
+    with open(path, "rb") as f:
+        f.seek(offset * RECORD.size)
+        data = f.read()
+    data = data[:len(data) - len(data) % RECORD.size]
+    for record in RECORD.iter_unpack(data):
+        _apply(state, *record)
+    state.pop("initiative_seq")
+    state.pop("initiative_open", None)
+
+    return Battle.from_dict(state, verbose)
@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from battle_sim.team import Team
+
+
+@dataclass(frozen=True)
+class TeamEntry:
+    """Index entry for one saved team file."""
+    filename: str
+    team_name: str
+    member_count: int
+    mtime_ns: int
+
+
+class TeamLibrary:
+    """Indexed view of a teams folder with an LRU cache of parsed teams.
+
+    Entries are keyed by file name and re-read only when a file's mtime
+    changes. They are kept in an index file in the folder, so a new process
+    lists the folder without reading the teams again. load() hands out copies,
+    so the cached teams are never modified by a battle. Safe to use from a
+    worker thread.
+    """
+
+    JSON_EXTENSION = ".json"
+    BINARY_EXTENSION = ".team"
+    INDEX_FILENAME = ".library-index"
+
+    def __init__(self, folder: str, cache_size: int = 16):
+        self.folder = folder
+        self.cache_size = cache_size
+        self._entries = {}
+        self._index_loaded = False
+        self._index_dirty = False
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+
+    def refresh(self, progress=None):
+        """Rescan the folder, re-indexing only new or modified files.
+
+        progress(done, total) is called after each file that is re-indexed.
+        """
+        with self._lock:
+            self._refresh(progress)
+
+    def _refresh(self, progress=None):
+        if not self._index_loaded:
+            self._read_index()
+        seen = set()
+        stale = []
+        with os.scandir(self.folder) as it:
+            for dir_entry in it:
+                if not dir_entry.name.endswith((self.JSON_EXTENSION, self.BINARY_EXTENSION)):
+                    continue
+                seen.add(dir_entry.name)
+                mtime_ns = dir_entry.stat().st_mtime_ns
+                entry = self._entries.get(dir_entry.name)
+                if entry is None or entry.mtime_ns != mtime_ns:
+                    stale.append((dir_entry.name, mtime_ns))
+
+        try:
+            for done, (filename, mtime_ns) in enumerate(stale, 1):
+                self._index(filename, mtime_ns)
+                if progress is not None:
+                    progress(done, len(stale))
+            for filename in self._entries.keys() - seen:
+                del self._entries[filename]
+                self._cache.pop(filename, None)
+                self._index_dirty = True
+        finally:
+            # Files indexed before a cancelled refresh are kept
+            if self._index_dirty:
+                self._write_index()
+
+    def entries(self, progress=None) -> list:
+        """Return index entries for every team file, sorted by file name.
+
+        progress(done, total) is called after each file that is re-indexed.
+        """
+        with self._lock:
+            self._refresh(progress)
+            return [self._entries[name] for name in sorted(self._entries)]
+
+    def find(self, team_name: str) -> list:
+        """Return entries whose team has the given name."""
+        return [entry for entry in self.entries() if entry.team_name == team_name]
+
+    def load(self, filename: str, progress=None) -> Team:
+        """Return a fresh copy of the team saved in filename.
+
+        progress(done, total) is called per creature while a file is parsed.
+        """
+        mtime_ns = os.stat(self._path(filename)).st_mtime_ns
+        with self._lock:
+            cached = self._cache.get(filename)
+            if cached is not None and cached[0] == mtime_ns:
+                self._cache.move_to_end(filename)
+                return cached[1].copy()
+
+        team = self._parse(filename, progress)
+        with self._lock:
+            self._remember(filename, mtime_ns, team)
+            self._entries[filename] = TeamEntry(filename, team.name, len(team), mtime_ns)
+            self._index_dirty = True
+        return team.copy()
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.folder, filename)
+
+    def _parse(self, filename: str, progress=None) -> Team:
+        if filename.endswith(self.BINARY_EXTENSION):
+            return Team.load_binary(self._path(filename), progress)
+        # Creatures build their HP, stats and resistances only once a battle uses them
+        return Team.load(self._path(filename), progress, lazy=True)
+
+    def _index(self, filename: str, mtime_ns: int):
+        try:
+            if filename.endswith(self.BINARY_EXTENSION):
+                # The binary header holds the name and count, no need to read the creatures
+                with open(self._path(filename), "rb") as f:
+                    team_name, member_count = Team.read_binary_header(f)
+            else:
+                # Only the name and count are needed, the creatures are left as dicts
+                with open(self._path(filename), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                team_name, member_count = data.get("team name", data.get("team_name")), len(data["teammates"])
+        except (OSError, ValueError, KeyError, TypeError):
+            # Still list broken files; load() reports the actual error
+            team_name, member_count = None, 0
+        self._entries[filename] = TeamEntry(filename, team_name, member_count, mtime_ns)
+        self._index_dirty = True
+
+    def _read_index(self):
+        self._index_loaded = True
+        try:
+            with open(self._path(self.INDEX_FILENAME), "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            entries = {filename: TeamEntry(filename, team_name, member_count, mtime_ns)
+                       for filename, (team_name, member_count, mtime_ns) in saved.items()}
+        except (OSError, ValueError, TypeError, AttributeError):
+            # Missing or unreadable: the scan indexes every file again
+            return
+        self._entries.update(entries)
+
+    def _write_index(self):
+        tmp_path = self._path(self.INDEX_FILENAME + ".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({entry.filename: [entry.team_name, entry.member_count, entry.mtime_ns]
+                           for entry in self._entries.values()}, f, separators=(",", ":"))
+            os.replace(tmp_path, self._path(self.INDEX_FILENAME))
+        except OSError:
+            # A read-only folder is still listed, just indexed again next time
+            return
+        self._index_dirty = False
+
+    def _remember(self, filename: str, mtime_ns: int, team: Team):
+        self._cache[filename] = (mtime_ns, team)
+        self._cache.move_to_end(filename)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
@@ -0,0 +1,363 @@
+"""Headless battle server: many battles behind one asyncio JSON-lines TCP socket.
+
+Every message is one JSON object per line. Requests carry an "id" and an "op";
+responses echo the id with "ok" and either "result" or "error":
+
+    -> {"id": 1, "op": "create", "seed": 7}
+    <- {"id": 1, "ok": true, "result": {"battle": 1}}
+
+Ops: list, create, load_team, roll_initiative, next_turn, damage, heal, state,
+subscribe and unsubscribe. Creatures are addressed by their index in the
+state's "creatures" list. Subscribing returns the state, and after every
+change to that battle the subscriber gets what changed pushed:
+
+    <- {"event": "delta", "battle": 1, "creatures": [[0, {...}]], "round_number": 2, ...}
+
+"creatures" holds [index, creature] pairs for the creatures that changed, and
+any other key replaces the state's key of that name. When creatures join or
+leave, or a client reads too slowly to keep up, the whole state is pushed
+instead: {"event": "state", "battle": ..., "state": ...}.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+from collections import deque
+from battle_sim import TEAMS_FOLDER
+from battle_sim.battle import Battle
+from battle_sim.library import TeamLibrary
+from characters import dice
+
+
+class BattleSession:
+    """One hosted battle. Its lock keeps commands from different clients in order.
+
+    While it has subscribers, it follows its creatures to know what changed
+    since the last push.
+    """
+
+    def __init__(self, battle_id: int, battle: Battle):
+        self.id = battle_id
+        self.battle = battle
+        self.lock = asyncio.Lock()
+        self.subscribers = set()
+        # Creatures followed, indexed as in the state, and what changed since the last push
+        self._creatures = []
+        self._index = {}
+        self._changed = set()
+        self._roster_stale = False
+        self._layout_stale = False
+        self._cursor_stale = False
+        battle.add_listener(self._on_battle_event)
+
+    def state(self) -> dict:
+        return self.battle.to_dict(sparse=True)
+
+    def creature(self, index) -> object:
+        creatures = self.battle.all_creatures()
+        if not isinstance(index, int) or not 0 <= index < len(creatures):
+            raise ValueError(f"No creature {index!r} in battle {self.id}.")
+        return creatures[index]
+
+    def subscribe(self, subscriber):
+        if not self.subscribers:
+            self._follow(self.battle.all_creatures())
+        self.subscribers.add(subscriber)
+        subscriber.sessions.add(self)
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+        subscriber.sessions.discard(self)
+        if not self.subscribers:
+            self._follow([])
+
+    def _follow(self, creatures: list):
+        for creature in self._creatures:
+            creature.remove_listener(self._on_creature_event)
+        self._creatures = creatures
+        self._index = {id(c): i for i, c in enumerate(creatures)}
+        for creature in creatures:
+            creature.add_listener(self._on_creature_event)
+        self._changed.clear()
+        self._roster_stale = self._layout_stale = self._cursor_stale = False
+
+    def _on_creature_event(self, event: str, creature):
+        index = self._index.get(id(creature))
+        if index is not None:
+            self._changed.add(index)
+
+    def _on_battle_event(self, event: str, battle: Battle):
+        if event in ("creature_added", "creature_removed", "initiative_set", "restored"):
+            self._roster_stale = self._layout_stale = True
+        elif event in ("turn_advanced", "died", "resurrected"):
+            self._cursor_stale = True
+
+    def changes(self) -> dict:
+        """The event to push for the changes since the last call, or None if nothing changed."""
+        if self._roster_stale:
+            creatures = self.battle.all_creatures()
+            if len(creatures) != len(self._creatures) or any(a is not b for a, b in zip(creatures, self._creatures)):
+                # Indexes moved, so the subscribers get the whole state again
+                self._follow(creatures)
+                return {"event": "state", "battle": self.id, "state": self.state()}
+        message = {"event": "delta", "battle": self.id}
+        if self._changed:
+            message["creatures"] = [[i, self._creatures[i].to_dict(sparse=True)] for i in sorted(self._changed)]
+        if self._layout_stale:
+            message.update(self.battle.layout(self._index))
+        elif self._cursor_stale:
+            message.update(self.battle.cursor())
+        self._changed.clear()
+        self._roster_stale = self._layout_stale = self._cursor_stale = False
+        return message if len(message) > 2 else None
+
+
+class Subscriber:
+    """Pushes events to one connection from its own task, so a client that reads
+    slowly only holds up itself. Past MAX_PENDING queued events, the queue is
+    replaced by the whole state of every battle it follows."""
+
+    MAX_PENDING = 256
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.sessions = set()
+        self._pending = deque()
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def push(self, message: dict):
+        if len(self._pending) >= self.MAX_PENDING:
+            self._pending.clear()
+            self._pending.extend({"event": "state", "battle": session.id, "state": session.state()}
+                                 for session in self.sessions)
+        else:
+            self._pending.append(message)
+        self._ready.set()
+
+    async def _run(self):
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                while self._pending:
+                    await BattleServer._send(self.writer, self._pending.popleft())
+        except ConnectionError:
+            self.close()
+
+    def close(self):
+        for session in list(self.sessions):
+            session.unsubscribe(self)
+        self._task.cancel()
+
+
+class BattleServer:
+    # Dice rolled by one damage expression, so one request can't stall every battle
+    MAX_DICE = 1000
+
+    def __init__(self, teams_folder: str = TEAMS_FOLDER):
+        self.library = TeamLibrary(teams_folder)
+        self.sessions = {}
+        self._ids = itertools.count(1)
+        self._server = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765):
+        # States of big battles are long lines
+        self._server = await asyncio.start_server(self._handle, host, port, limit=1 << 24)
+        return self._server
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    # ----- Connections -----
+    async def _handle(self, reader, writer):
+        connection = {"writer": writer, "subscriber": None}
+        try:
+            while line := await reader.readline():
+                request_id = None
+                try:
+                    message = json.loads(line)
+                    request_id = message.get("id")
+                    response = {"id": request_id, "ok": True, "result": await self.dispatch(message, connection)}
+                except Exception as e:
+                    # Any failure of one request is reported, the connection stays up
+                    response = {"id": request_id, "ok": False, "error": str(e) or type(e).__name__}
+                await self._send(writer, response)
+        except ConnectionError:
+            pass
+        finally:
+            if connection["subscriber"] is not None:
+                connection["subscriber"].close()
+            writer.close()
+
+    @staticmethod
+    async def _send(writer, message: dict):
+        writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+        await writer.drain()
+
+    # ----- Commands -----
+    async def dispatch(self, message: dict, connection=None):
+        op = message.get("op")
+        if op == "list":
+            return [{"battle": s.id, "creatures": len(s.battle.all_creatures())} for s in self.sessions.values()]
+        if op == "create":
+            battle_id = next(self._ids)
+            self.sessions[battle_id] = BattleSession(battle_id, Battle(verbose=False, seed=message.get("seed")))
+            return {"battle": battle_id}
+
+        session = self.sessions.get(message.get("battle"))
+        if session is None:
+            raise KeyError(f"Unknown battle {message.get('battle')!r}.")
+        handler = self.COMMANDS.get(op)
+        if handler is None:
+            raise ValueError(f"Unknown op {op!r}.")
+
+        async with session.lock:
+            result, changed = await handler(self, session, message, connection)
+            # Queued without waiting, so a slow subscriber never holds the lock
+            event = session.changes() if changed and session.subscribers else None
+            if event is not None:
+                for subscriber in session.subscribers:
+                    subscriber.push(event)
+        return result
+
+    async def _state(self, session, message, connection):
+        return session.state(), False
+
+    async def _subscribe(self, session, message, connection):
+        if connection is None:
+            raise ValueError("Subscribing needs a connection.")
+        if connection["subscriber"] is None:
+            connection["subscriber"] = Subscriber(connection["writer"])
+        session.subscribe(connection["subscriber"])
+        return session.state(), False
+
+    async def _unsubscribe(self, session, message, connection):
+        if connection is not None and connection["subscriber"] is not None:
+            session.unsubscribe(connection["subscriber"])
+        return None, False
+
+    async def _load_team(self, session, message, connection):
+        filename = message["filename"]
+        if os.path.basename(filename) != filename:
+            raise ValueError(f"Invalid team file {filename!r}.")
+        # Parsing a big roster shouldn't stall the other battles
+        team = await asyncio.to_thread(self.library.load, filename)
+        session.battle.add_team(team)
+        return {"team": team.name, "members": len(team)}, True
+
+    async def _roll_initiative(self, session, message, connection):
+        battle = session.battle
+        rolls = message.get("rolls")
+        init_list = battle.get_initiative_list()
+        if rolls is not None:
+            if len(rolls) != len(init_list):
+                raise ValueError(f"Expected {len(init_list)} initiative rolls.")
+            init_list = [(creature, int(roll)) for (creature, _), roll in zip(init_list, rolls)]
+        battle.battle_started = False
+        battle.set_initiative(init_list, manual_init=rolls is not None)
+        return [initiative for _, initiative in battle.turn_order], True
+
+    async def _next_turn(self, session, message, connection):
+        round_number, creature, initiative = session.battle.next_turn()
+        return {"round": round_number, "creature": None if creature is None else creature.name,
+                "initiative": initiative}, True
+
+    async def _damage(self, session, message, connection):
+        creature = session.creature(message.get("target"))
+        amount = message["amount"]
+        if isinstance(amount, str) and sum(term.count for term in dice.parse(amount).terms) > self.MAX_DICE:
+            raise ValueError(f"At most {self.MAX_DICE} dice per damage roll.")
+        result = creature.damage(amount, message.get("damage_type", "true"), session.battle.rng)
+        return result, True
+
+    async def _heal(self, session, message, connection):
+        creature = session.creature(message.get("target"))
+        return creature.heal(int(message["amount"])), True
+
+    COMMANDS = {
+        "state": _state,
+        "subscribe": _subscribe,
+        "unsubscribe": _unsubscribe,
+        "load_team": _load_team,
+        "roll_initiative": _roll_initiative,
+        "next_turn": _next_turn,
+        "damage": _damage,
+        "heal": _heal,
+    }
+
+
+class BattleClient:
+    """Minimal asyncio client. Pushed state updates land in the events queue."""
+
+    def __init__(self):
+        self.events = asyncio.Queue()
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._reader = None
+        self._writer = None
+        self._reading = None
+
+    async def connect(self, host: str = "127.0.0.1", port: int = 8765):
+        self._reader, self._writer = await asyncio.open_connection(host, port, limit=1 << 24)
+        self._reading = asyncio.create_task(self._read())
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._reading.cancel()
+
+    async def request(self, op: str, **params):
+        """Send one command and wait for its result. Raises RuntimeError with the server's error."""
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._writer.write(json.dumps({"id": request_id, "op": op, **params}).encode() + b"\n")
+        await self._writer.drain()
+        response = await future
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+    async def _read(self):
+        while line := await self._reader.readline():
+            message = json.loads(line)
+            if "event" in message:
+                self.events.put_nowait(message)
+            else:
+                future = self._pending.pop(message["id"], None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host battles over a JSON-lines TCP API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--teams", default=TEAMS_FOLDER, help="folder with saved team files")
+    args = parser.parse_args(argv)
+
+    async def run():
+        server = BattleServer(args.teams)
+        await server.start(args.host, args.port)
+        print(f"Serving battles on {args.host}:{server.port}")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+import os
+import random
+from collections import Counter
+from dataclasses import dataclass
+from characters import dice
+from battle_sim.battle import Battle
+from battle_sim.team import Team
+
+
+@dataclass(frozen=True)
+class Attack:
+    """Damage a creature deals on its turn: num_dice d die + bonus, or any dice
+    expression such as "2d20kh1+5" given as expression."""
+    num_dice: int = 1
+    die: int = 6
+    bonus: int = 0
+    damage_type: str = "true"
+    expression: str = None
+
+    @property
+    def dice(self) -> dice.Dice:
+        return dice.parse(self.expression or f"{self.num_dice}d{self.die}{self.bonus:+d}")
+
+    def roll(self, rng: random.Random) -> int:
+        return self.dice.roll(rng)
+
+
+def team_labels(team_names) -> list:
+    """Distinct labels for teams: their names, with a number added from the
+    second team of the same name on, e.g. "goblins (2)"."""
+    labels = []
+    for i, name in enumerate(team_names):
+        name = f"team {i + 1}" if name is None else str(name)
+        label, n = name, 1
+        while label in labels:
+            n += 1
+            label = f"{name} ({n})"
+        labels.append(label)
+    return labels
+
+
+class SimulationResult:
+    """Aggregated outcome of many simulated battles."""
+
+    def __init__(self, team_names, team_sizes):
+        self.team_names = list(team_names)
+        self.labels = team_labels(self.team_names)
+        self.runs = 0
+        self.wins = [0] * len(self.team_names)
+        self.draws = 0
+        self.rounds = Counter()
+        self.hp_left = [[0] * size for size in team_sizes]
+        self.deaths = [[0] * size for size in team_sizes]
+
+    def record(self, winner: int, rounds: int, hp: list):
+        """Add one battle. winner is a team index or -1 for a draw."""
+        self.runs += 1
+        if winner < 0:
+            self.draws += 1
+        else:
+            self.wins[winner] += 1
+        self.rounds[rounds] += 1
+        for team_hp, team_sum, team_deaths in zip(hp, self.hp_left, self.deaths):
+            for i, value in enumerate(team_hp):
+                team_sum[i] += value
+                if value == 0:
+                    team_deaths[i] += 1
+
+    def merge(self, other: "SimulationResult"):
+        self.runs += other.runs
+        self.draws += other.draws
+        self.wins = [a + b for a, b in zip(self.wins, other.wins)]
+        self.rounds.update(other.rounds)
+        for mine, theirs in zip(self.hp_left, other.hp_left):
+            for i, value in enumerate(theirs):
+                mine[i] += value
+        for mine, theirs in zip(self.deaths, other.deaths):
+            for i, value in enumerate(theirs):
+                mine[i] += value
+
+    def win_rates(self) -> dict:
+        """Return {team label: win rate}, in team order, plus the draw rate under None.
+
+        Labels are the team names, told apart when teams share one (see team_labels)."""
+        rates = {label: wins / self.runs for label, wins in zip(self.labels, self.wins)}
+        rates[None] = self.draws / self.runs
+        return rates
+
+    def mean_rounds(self) -> float:
+        return sum(r * n for r, n in self.rounds.items()) / self.runs
+
+    def mean_hp_left(self) -> list:
+        """Average HP left per creature, as one list per team."""
+        return [[total / self.runs for total in team] for team in self.hp_left]
+
+    def death_rates(self) -> list:
+        """Chance of each creature ending the battle dead, as one list per team."""
+        return [[deaths / self.runs for deaths in team] for team in self.deaths]
+
+
+class Simulation:
+    """Headless Monte Carlo simulation of one encounter.
+
+    Every run rebuilds the teams from their dicts, rolls initiative and lets
+    each creature attack a random living enemy on its turn until one team is
+    left standing or max_rounds pass (a draw). Run i uses its own RNG seeded
+    from (seed, i), so results don't depend on how runs are split across
+    processes. seed=battle.spawn_seed(key) makes a simulation a child stream
+    of a battle.
+    """
+
+    def __init__(self, teams, attacks: dict = None, default_attack: Attack = Attack(),
+                 seed=0, max_rounds: int = 100):
+        self.team_dicts = [team.to_dict() for team in teams]
+        self.team_names = [team.name for team in teams]
+        self.team_sizes = [len(team) for team in teams]
+        # Attacks may be given as dice expressions
+        self.attacks = {name: Attack(expression=attack) if isinstance(attack, str) else attack
+                        for name, attack in (attacks or {}).items()}
+        self.default_attack = default_attack
+        self.seed = seed
+        self.max_rounds = max_rounds
+
+    def play(self, run_index: int):
+        """Play one battle. Returns (winner, rounds, hp left per team)."""
+        teams = [Team.from_dict(data) for data in self.team_dicts]
+        side = {id(c): i for i, team in enumerate(teams) for c in team}
+
+        battle = Battle(verbose=False, seed=f"{self.seed}:{run_index}")
+        rng = battle.rng
+        for team in teams:
+            battle.add_team(team)
+        battle.set_initiative(battle.get_initiative_list())
+
+        winner = -1
+        while True:
+            standing = [i for i, team in enumerate(teams) if team.alive_count()]
+            if len(standing) <= 1:
+                winner = standing[0] if standing else -1
+                break
+            round_number, creature, _ = battle.next_turn()
+            if creature is None or round_number > self.max_rounds:
+                break
+
+            own_side = side[id(creature)]
+            enemies = [c for i, team in enumerate(teams) if i != own_side
+                       for c in team.iter_alive()]
+            attack = self.attacks.get(creature.name, self.default_attack)
+            rng.choice(enemies).hit(attack.roll(rng), attack.damage_type, record=False)
+
+        rounds = min(battle.round_number, self.max_rounds)
+        hp = [[c.hp.real_hp for c in team] for team in teams]
+        return winner, rounds, hp
+
+    def play_range(self, start: int, stop: int) -> SimulationResult:
+        result = SimulationResult(self.team_names, self.team_sizes)
+        for run_index in range(start, stop):
+            result.record(*self.play(run_index))
+        return result
+
+    def run(self, runs: int, workers: int = None, chunk_size: int = None,
+            progress=None) -> SimulationResult:
+        """Play runs battles spread over a process pool and aggregate them.
+
+        workers=1 plays everything in the current process. progress(done, total)
+        is called as chunks finish; an exception raised by it cancels the rest.
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            chunk_size = chunk_size or 1000
+            result = SimulationResult(self.team_names, self.team_sizes)
+            for start in range(0, runs, chunk_size):
+                result.merge(self.play_range(start, min(start + chunk_size, runs)))
+                if progress is not None:
+                    progress(result.runs, runs)
+            return result
+
+        if chunk_size is None:
+            chunk_size = max(1, runs // (workers * 4))
+        bounds = [(start, min(start + chunk_size, runs)) for start in range(0, runs, chunk_size)]
+        # The process pool machinery is slow to import, and single-process runs never need it
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        result = SimulationResult(self.team_names, self.team_sizes)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_play_range, self, start, stop) for start, stop in bounds]
+            try:
+                for future in as_completed(futures):
+                    result.merge(future.result())
+                    if progress is not None:
+                        progress(result.runs, runs)
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        return result
+
+
+def _play_range(simulation: Simulation, start: int, stop: int) -> SimulationResult:
+    return simulation.play_range(start, stop)
+
+
+if __name__ == '__main__':
+    from characters.creature import Creature
+    from characters.hp import HP
+
+    heroes = Team("heroes", [Creature(name, hp=HP(20, 20)) for name in ("A", "B")])
+    goblins = Team("goblins", [Creature(f"goblin{i}", hp=HP(7, 7)) for i in range(6)])
+
+    simulation = Simulation([heroes, goblins], attacks={"A": Attack(1, 8, 3), "B": "2d6"},
+                            default_attack=Attack(1, 6, 2), seed=42)
+    result = simulation.run(2000)
+    print(result.win_rates())
+    print(f"Mean rounds: {result.mean_rounds():.2f}")
+    print(result.mean_hp_left())
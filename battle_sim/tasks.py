@@ -0,0 +1,101 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskCancelled(Exception):
+    """Raised inside a background task once it has been cancelled."""
+
+
+class Task:
+    """Handle shared by a background job and the GUI."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.done = 0
+        self.total = 0
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def progress(self, done: int, total: int):
+        """Report progress from the worker. Raises TaskCancelled after cancel()."""
+        self.done, self.total = done, total
+        if self._cancelled.is_set():
+            raise TaskCancelled()
+
+
+class BackgroundRunner:
+    """Runs work off the Tk main thread.
+
+    Jobs run on a small thread pool and receive their Task. Completion
+    callbacks are queued and called on the main thread from a root.after poll,
+    which also reports progress, so callbacks can touch widgets freely.
+    """
+
+    POLL_MS = 50
+
+    def __init__(self, root, max_workers: int = 2):
+        self.root = root
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="battle-worker")
+        self._finished = queue.Queue()
+        self._active = {}
+        self._polling = False
+
+    def submit(self, label: str, work, on_done=None, on_error=None, on_cancel=None,
+               on_progress=None) -> Task:
+        """Run work(task) on a worker and call on_done(result), on_error(exc) or
+        on_cancel() on the main thread. on_progress(task) is called on every poll."""
+        task = Task(label)
+
+        def run():
+            try:
+                result = work(task)
+            except TaskCancelled:
+                self._finished.put((task, on_cancel, ()))
+            except Exception as e:
+                self._finished.put((task, on_error, (e,)))
+            else:
+                self._finished.put((task, on_done, (result,)))
+
+        self._active[task] = on_progress
+        self._pool.submit(run)
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+        return task
+
+    def busy(self) -> bool:
+        return bool(self._active)
+
+    def cancel_all(self):
+        for task in self._active:
+            task.cancel()
+
+    def shutdown(self):
+        self.cancel_all()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _poll(self):
+        for task, on_progress in list(self._active.items()):
+            if on_progress is not None:
+                on_progress(task)
+
+        while True:
+            try:
+                task, callback, args = self._finished.get_nowait()
+            except queue.Empty:
+                break
+            self._active.pop(task, None)
+            if callback is not None:
+                callback(*args)
+
+        if self._active:
+            self.root.after(self.POLL_MS, self._poll)
+        else:
+            self._polling = False
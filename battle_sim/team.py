@@ -1,53 +1,193 @@
 from characters.creature import Creature
+from characters import instrumentation
 import json
+import struct
+
+# Binary roster header: magic, format version, member count and team name length
+BINARY_MAGIC = b"DNDT"
+_HEADER = struct.Struct("<4sBIH")
+# Name length of a team without a name, told apart from an empty name
+_NO_NAME = 0xFFFF
 
 
 class Team:
     def __init__(self, name: str, teammates=None):
         self.name = name
-        self.teammates = teammates if teammates is not None else []
+        # Members and living members keyed by id(creature), in insertion order
+        self._members = {}
+        self._alive = {}
+        self._teammates = None
+        for creature in teammates if teammates is not None else []:
+            self.add_creature(creature)
+
+    @property
+    def teammates(self) -> tuple:
+        """Members in insertion order. A tuple, so changes go through add_creature
+        and remove_creature and the membership index stays in sync."""
+        if self._teammates is None:
+            self._teammates = tuple(self._members.values())
+        return self._teammates
 
     def add_creature(self, creature):
-        self.teammates.append(creature)
+        key = id(creature)
+        if key in self._members:
+            return
+        self._members[key] = creature
+        if creature.alive:
+            self._alive[key] = creature
+        creature.add_listener(self._on_creature_event)
+        self._teammates = None
 
     def remove_creature(self, creature):
-        if creature in self.teammates:
-            self.teammates.remove(creature)
+        key = id(creature)
+        if self._members.pop(key, None) is not None:
+            self._alive.pop(key, None)
+            creature.remove_listener(self._on_creature_event)
+            self._teammates = None
+
+    def _on_creature_event(self, event: str, creature):
+        if event == "died":
+            self._alive.pop(id(creature), None)
+        elif event == "resurrected":
+            self._alive[id(creature)] = creature
 
     def get_alive(self):
-        return [c for c in self.teammates if c.alive]
+        return list(self._alive.values())
+
+    def iter_alive(self):
+        return iter(self._alive.values())
+
+    def alive_count(self) -> int:
+        return len(self._alive)
+
+    def __contains__(self, creature):
+        return id(creature) in self._members
 
     def __len__(self):
-        return len(self.teammates)
+        return len(self._members)
 
     def __iter__(self):
-        return iter(self.teammates)
+        return iter(self._members.values())
 
     def __getitem__(self, index):
         return self.teammates[index]
 
+    def copy(self):
+        """Return a copy of the team with independent creatures."""
+        return Team(self.name, [c.copy() for c in self.teammates])
+
     # ----- Serialization -----
-    def to_dict(self):
+    def to_dict(self, sparse: bool = False):
         return {
             "team name": self.name,
-            "teammates": [c.to_dict() for c in self.teammates]
+            "teammates": [c.to_dict(sparse) for c in self.teammates]
         }
 
     @classmethod
-    def from_dict(cls, data):
-        name = data.get("team_name")
-        teammates = [Creature.from_dict(cd) for cd in data["teammates"]]
+    def from_dict(cls, data, progress=None, lazy: bool = False):
+        """Build a team from a dict. progress(done, total) is called after each creature.
+        lazy leaves each creature's parts as raw dicts until used (see Creature.from_dict)."""
+        name = data.get("team name", data.get("team_name"))
+        shared = {} if lazy else None
+        if progress is None:
+            teammates = [Creature.from_dict(cd, lazy, shared) for cd in data["teammates"]]
+        else:
+            total = len(data["teammates"])
+            teammates = []
+            for cd in data["teammates"]:
+                teammates.append(Creature.from_dict(cd, lazy, shared))
+                progress(len(teammates), total)
         return cls(name=name, teammates=teammates)
 
-    def save(self, filename):
+    def save(self, filename, sparse: bool = False):
+        """Write the team as JSON.
+
+        sparse leaves out default stats and resistances and writes compact JSON
+        without indentation; load fills the defaults back in.
+        """
         with open(filename, "w", encoding="utf-8") as f:
-            json.dump(self.to_dict(), f, indent=4)
+            if sparse:
+                json.dump(self.to_dict(sparse=True), f, separators=(",", ":"))
+            else:
+                json.dump(self.to_dict(), f, indent=4)
 
     @classmethod
-    def load(cls, filename):
+    def load(cls, filename, progress=None, lazy: bool = False):
         with open(filename, "r", encoding="utf-8") as f:
             data = json.load(f)
-        return cls.from_dict(data)
+        return cls.from_dict(data, progress, lazy)
+
+    # ----- Binary roster -----
+    def save_binary(self, filename):
+        """Write the team in the compact binary roster format."""
+        name = b"" if self.name is None else self.name.encode("utf-8")
+        if len(name) >= _NO_NAME:
+            raise ValueError(f"Team names are limited to {_NO_NAME - 1} bytes in a binary roster.")
+        name_len = _NO_NAME if self.name is None else len(name)
+        with open(filename, "wb") as f:
+            f.write(_HEADER.pack(BINARY_MAGIC, 1, len(self.teammates), name_len))
+            f.write(name)
+            for c in self.teammates:
+                f.write(c.to_bytes())
+
+    @staticmethod
+    def read_binary_header(f):
+        """Read the roster header from an open binary file. Returns (team name, member count)."""
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError("Not a binary team roster.")
+        magic, version, count, name_len = _HEADER.unpack(header)
+        if magic != BINARY_MAGIC or version != 1:
+            raise ValueError("Not a binary team roster.")
+        if name_len == _NO_NAME:
+            return None, count
+        return f.read(name_len).decode("utf-8"), count
+
+    @classmethod
+    def iter_binary(cls, filename):
+        """Stream creatures from a binary roster one at a time."""
+        with open(filename, "rb") as f:
+            cls.read_binary_header(f)
+            while (creature := Creature.read_bytes(f)) is not None:
+                yield creature
+
+    @classmethod
+    def load_binary(cls, filename, progress=None):
+        """Load a binary roster. progress(done, total) is called after each creature."""
+        with open(filename, "rb") as f:
+            name, total = cls.read_binary_header(f)
+            teammates = []
+            while (creature := Creature.read_bytes(f)) is not None:
+                teammates.append(creature)
+                if progress is not None:
+                    progress(len(teammates), total)
+        return cls(name=name, teammates=teammates)
+
+
+instrumentation.instrument(Team, "to_dict", "from_dict", "save", "load", "save_binary", "load_binary")
+
+
+def json_to_binary(json_filename, binary_filename):
+    """Convert a JSON team file to the binary roster format."""
+    Team.load(json_filename).save_binary(binary_filename)
+
+
+def binary_to_json(binary_filename, json_filename):
+    """Convert a binary roster to a JSON team file, streaming one creature at a time.
+
+    The output matches Team.save byte for byte.
+    """
+    with open(binary_filename, "rb") as src, open(json_filename, "w", encoding="utf-8") as f:
+        name, count = Team.read_binary_header(src)
+        f.write('{\n    "team name": ' + json.dumps(name) + ',\n    "teammates": [')
+        if not count:
+            f.write("]\n}")
+            return
+        for i in range(count):
+            creature = Creature.read_bytes(src)
+            f.write(("," if i else "") + "\n        "
+                    + json.dumps(creature.to_dict(), indent=4).replace("\n", "\n        "))
+        f.write("\n    ]\n}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,112 @@
+import tkinter as tk
+from collections import Counter
+
+
+class TurnOrderView(tk.Frame):
+    """Virtualized turn order list.
+
+    Only the rows that fit in the widget are rendered, and a refresh rewrites
+    only the lines whose text or tag changed since the last one, so redrawing
+    costs the same for 10 creatures or 5,000. The name column width comes from
+    a count of name lengths that is rebuilt only when creatures join or leave.
+    """
+
+    def __init__(self, master, battle, rows: int = 9, width: int = 40):
+        super().__init__(master)
+        self.battle = battle
+        self.rows = rows
+        self.first = 0
+
+        self.text = tk.Text(self, height=rows + 1, width=width, wrap="none")
+        self.text.tag_configure("round", font=("Courier New", 10, "bold"))
+        self.text.tag_configure("active", foreground="red", font=("Courier New", 10, "bold"))
+        self.text.tag_configure("normal", foreground="black", font=("Courier New", 10))
+        self.text.tag_configure("dead", foreground="gray", font=("Courier New", 10))
+        self.text.pack(side="left", fill="both", expand=True)
+
+        self.scrollbar = tk.Scrollbar(self, command=self._on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.text.bind("<MouseWheel>", self._on_wheel)
+        self.text.bind("<Button-4>", lambda e: self.scroll_to(self.first - 1))
+        self.text.bind("<Button-5>", lambda e: self.scroll_to(self.first + 1))
+
+        # Header plus one line per visible row, as (content, tag)
+        self._lines = [("", "normal")] * (rows + 1)
+        self.text.insert("1.0", "\n" * rows)
+        self.text.config(state="disabled")
+
+        self._names = None
+        self._following = None
+        battle.add_listener(self._on_battle_event)
+
+    def _on_battle_event(self, event: str, battle):
+        if event in ("creature_added", "creature_removed", "initiative_set", "restored"):
+            self._names = None
+
+    def _name_width(self) -> int:
+        """Longest name in the turn order, recounted only after creatures joined or left."""
+        if self._names is None:
+            self._names = Counter(len(c.name) for c, _ in self.battle.turn_order)
+        return max(self._names) if self._names else 0
+
+    def scroll_to(self, first: int):
+        last_first = max(len(self.battle.turn_order) - self.rows, 0)
+        self.first = min(max(first, 0), last_first)
+        self.refresh(follow_active=False)
+
+    def _on_scroll(self, *args):
+        count = len(self.battle.turn_order)
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * count))
+        elif args[0] == "scroll":
+            step = self.rows if args[2] == "pages" else 1
+            self.scroll_to(self.first + int(args[1]) * step)
+
+    def _on_wheel(self, event):
+        self.scroll_to(self.first - (1 if event.delta > 0 else -1))
+        return "break"
+
+    def refresh(self, follow_active: bool = True):
+        battle = self.battle
+        order = battle.turn_order
+        count = len(order)
+        active = battle.active_index
+
+        if not order:
+            lines = [("No turn order set.", "normal")] + [("", "normal")] * self.rows
+        else:
+            # Keep the active creature in view when the turn moves on
+            if follow_active and active is not None and active != self._following:
+                if not self.first <= active < self.first + self.rows:
+                    self.first = min(max(active - self.rows // 2, 0), max(count - self.rows, 0))
+            self._following = active
+            self.first = min(self.first, max(count - self.rows, 0))
+
+            width = self._name_width()
+            lines = [(f"=== Round {battle.round_number} ===", "round")]
+            for idx in range(self.first, min(self.first + self.rows, count)):
+                creature, initiative = order[idx]
+                line = (f"{idx + 1:2}. {creature.name.ljust(width)}   Init: {initiative} "
+                        f"HP: {creature.hp.real_hp}/{creature.hp.max_hp}")
+                if idx == active:
+                    tag = "active"
+                elif not creature.alive:
+                    tag = "dead"
+                else:
+                    tag = "normal"
+                lines.append((line, tag))
+            lines += [("", "normal")] * (self.rows + 1 - len(lines))
+
+        changed = [(i, line) for i, line in enumerate(lines) if line != self._lines[i]]
+        if changed:
+            self.text.config(state="normal")
+            for i, (content, tag) in changed:
+                self.text.delete(f"{i + 1}.0", f"{i + 1}.end")
+                self.text.insert(f"{i + 1}.0", content, tag)
+            self.text.config(state="disabled")
+            self._lines = lines
+
+        if count > self.rows:
+            self.scrollbar.set(self.first / count, (self.first + self.rows) / count)
+        else:
+            self.scrollbar.set(0, 1)
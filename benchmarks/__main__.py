@@ -0,0 +1,205 @@
+"""Benchmarks for the combat hot paths.
+
+    python -m benchmarks                        run everything and print a table
+    python -m benchmarks --save base.json       also write the results as a baseline
+    python -m benchmarks --compare base.json    fail if anything got slower than the baseline
+    python -m benchmarks --compare base.json --check-startup
+                                                also fail if a cold start got slower than the baseline
+
+Every run also checks the bytes per creature against the budgets in
+cases.py, and reports the cold start of the headless entry points. Wall-clock
+start times depend on the machine and its load, so they only fail a run with
+--check-startup, against the times measured for a baseline on the same machine.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+from benchmarks.cases import CASES, MEMORY, STARTUP
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(fn, repeat: int) -> float:
+    """Best time of one fn() call over repeat samples, each long enough to time reliably."""
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=loops)) / loops
+
+
+def run(pattern: str = "", quick: bool = False, repeat: int = 5) -> dict:
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            for name, sizes, quick_sizes, setup in CASES:
+                if pattern not in name:
+                    continue
+                for size in quick_sizes if quick else sizes:
+                    fn, ops, *teardown = setup(size)
+                    try:
+                        seconds = measure(fn, repeat)
+                    finally:
+                        for close in teardown:
+                            close()
+                    key = f"{name}@{size}"
+                    results[key] = {"seconds": seconds, "ops": ops, "ops_per_sec": ops / seconds}
+                    print(f"{key:40} {seconds * 1000:12.3f} ms {ops / seconds:16,.0f} ops/s")
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def bytes_per_object(build, count: int = 10000) -> float:
+    """Average memory held by one object made by build(i), name string included."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        objects = [build(i) for i in range(count)]
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del objects
+    return size / count
+
+
+def check_memory() -> tuple:
+    """Measure every registered footprint. Returns ({name: bytes}, names over budget)."""
+    footprints = {}
+    over = []
+    for name, budget, build in MEMORY:
+        footprints[name] = size = bytes_per_object(build)
+        flag = ""
+        if size > budget:
+            over.append(name)
+            flag = "  OVER BUDGET"
+        print(f"{name:40} {size:10.0f} bytes (budget {budget}){flag}")
+    return footprints, over
+
+
+def cold_start(arguments: list, repeat: int = 5) -> float:
+    """Best wall time in seconds of a fresh interpreter run with arguments, from the repo root."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *arguments], cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def check_startup() -> tuple:
+    """Time every registered cold start against a bare interpreter. Returns ({name: ms}, names that failed)."""
+    bare = cold_start(["-c", "pass"])
+    timings = {}
+    failed = []
+    for name, arguments in STARTUP:
+        try:
+            timings[name] = ms = (cold_start(arguments) - bare) * 1000
+        except subprocess.CalledProcessError:
+            failed.append(name)
+            print(f"{name:40} {'failed':>10}")
+            continue
+        print(f"{name:40} {ms:10.1f} ms over a bare interpreter")
+    return timings, failed
+
+
+def compare_startup(timings: dict, baseline: dict, threshold: float) -> list:
+    """Print cold starts against a baseline and return the names slower by more than threshold."""
+    slower = []
+    print(f"\n{'cold start':40} {'baseline':>12} {'current':>12} {'slowdown':>9}")
+    for name, ms in timings.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:40} {'-':>12} {ms:9.1f} ms      new")
+            continue
+        # A start that adds almost nothing to the interpreter can't slow down by a ratio
+        change = (ms - before) / max(before, 1.0)
+        flag = ""
+        if change > threshold:
+            slower.append(name)
+            flag = "  SLOWER"
+        print(f"{name:40} {before:9.1f} ms {ms:9.1f} ms {change:+9.1%}{flag}")
+    return slower
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Print the change against a baseline and return the keys that slowed down by more than threshold."""
+    regressions = []
+    print(f"\n{'benchmark':40} {'baseline':>12} {'current':>12} {'slowdown':>9}")
+    for key, current in results.items():
+        before = baseline.get(key)
+        if before is None:
+            print(f"{key:40} {'-':>12} {current['ops_per_sec']:12,.0f}      new")
+            continue
+        change = before["ops_per_sec"] / current["ops_per_sec"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(key)
+            flag = "  SLOWER"
+        print(f"{key:40} {before['ops_per_sec']:12,.0f} {current['ops_per_sec']:12,.0f} {change:+9.1%}{flag}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the combat hot paths.")
+    parser.add_argument("-k", dest="pattern", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--quick", action="store_true", help="skip the largest sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="timing samples per benchmark (best is kept)")
+    parser.add_argument("--save", metavar="FILE", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="allowed slowdown against the baseline before failing (default 0.15)")
+    parser.add_argument("--check-startup", action="store_true",
+                        help="also fail if a cold start got slower than in the --compare baseline")
+    parser.add_argument("--startup-threshold", type=float, default=0.5,
+                        help="allowed cold start slowdown with --check-startup (default 0.5)")
+    args = parser.parse_args(argv)
+    if args.check_startup and not args.compare:
+        parser.error("--check-startup needs a --compare baseline")
+
+    results = run(args.pattern, args.quick, args.repeat)
+    print()
+    footprints, over_budget = check_memory()
+    print()
+    startup, failed_start = check_startup()
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.platform(),
+                       "results": results, "memory": footprints, "startup_ms": startup}, f, indent=4)
+
+    slow_start = []
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.threshold)
+        if args.check_startup:
+            slow_start = compare_startup(startup, baseline.get("startup_ms", {}), args.startup_threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}")
+            return 1
+    if over_budget:
+        print(f"\n{len(over_budget)} object(s) larger than their memory budget")
+        return 1
+    if failed_start:
+        print(f"\n{len(failed_start)} entry point(s) failed")
+        return 1
+    if slow_start:
+        print(f"\n{len(slow_start)} entry point(s) started slower than the baseline "
+              f"by more than {args.startup_threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import random
+from characters import dice
+from characters.creature import Creature
+from characters.hp import HP
+from characters.resistances import MODES
+from characters.table import CreatureTable
+from battle_sim.autosave import Autosave
+from battle_sim.battle import Battle
+from battle_sim.team import Team
+
+# Hit points large enough that repeated damage never kills anything
+BIG_HP = 10 ** 9
+
+CASES = []
+MEMORY = []
+
+
+def case(name: str, sizes, quick_sizes=None):
+    """Register a benchmark. The decorated setup(size) builds the state and returns
+    (fn, ops): fn() is the timed call and ops the operations one call performs. A third
+    item, if returned, is called once timing is done to release what setup opened."""
+    def register(setup):
+        CASES.append((name, tuple(sizes), tuple(quick_sizes or sizes), setup))
+        return setup
+    return register
+
+
+# Cold start of the headless entry points, measured in a fresh interpreter:
+# (name, interpreter arguments). A non-zero exit fails the run, so the last one
+# also proves tkinter stays unloaded.
+STARTUP = [
+    ("python -m battle_sim --help", ["-m", "battle_sim", "--help"]),
+    ("import battle_sim.simulation", ["-c", "import battle_sim.simulation"]),
+    ("headless imports skip tkinter", ["-c", "import sys, battle_sim.__main__, battle_sim.server, "
+                                             "battle_sim.simulation; sys.exit('tkinter' in sys.modules)"]),
+]
+
+
+def footprint(name: str, budget: int):
+    """Register a memory check. The decorated build(i) makes one object; the runner
+    fails if an object costs more than budget bytes."""
+    def register(build):
+        MEMORY.append((name, budget, build))
+        return build
+    return register
+
+
+@footprint("creature", 450)
+def creature(i):
+    return Creature(f"c{i}", hp=HP(20, 20))
+
+
+@footprint("creature with resistances", 450)
+def resistant_creature(i):
+    creature = Creature(f"c{i}", hp=HP(20, 20))
+    creature.set_resistance("fire", "resistant")
+    return creature
+
+
+_table = CreatureTable()
+
+
+@footprint("creature in a CreatureTable", 360)
+def table_creature(i):
+    # Row columns are counted too, the table itself is shared
+    creature = Creature(f"c{i}", hp=HP(20, 20))
+    _table.add(creature)
+    return creature
+
+
+def _creatures(size: int, hp: int = BIG_HP, dead_every: int = 0):
+    creatures = []
+    for i in range(size):
+        creature = Creature(f"c{i}", hp=HP(hp, hp))
+        if dead_every and i % dead_every:
+            creature.die()
+        creatures.append(creature)
+    return creatures
+
+
+def _damage_case(mode):
+    def setup(size):
+        creatures = _creatures(size)
+        for creature in creatures:
+            creature.set_resistance("fire", mode, 1)
+
+        def fn():
+            for creature in creatures:
+                creature.damage(3, "fire")
+        return fn, size
+    return setup
+
+
+for _mode in MODES:
+    case(f"creature_damage[{_mode}]", [1000])(_damage_case(_mode))
+
+
+@case("creature_hit[no record]", [1000])
+def hit(size):
+    creatures = _creatures(size)
+
+    def fn():
+        for creature in creatures:
+            creature.hit(3, "fire", record=False)
+    return fn, size
+
+
+@case("creature_heal", [1000])
+def heal(size):
+    creatures = _creatures(size)
+    for creature in creatures:
+        creature.hp.real_hp = 1
+
+    def fn():
+        for creature in creatures:
+            creature.heal(1)
+    return fn, size
+
+
+@case("dice_roll[8d6+3]", [1000])
+def dice_roll(size):
+    expression = dice.parse("8d6+3")
+    rng = random.Random(0)
+
+    def fn():
+        for _ in range(size):
+            expression.roll(rng)
+    return fn, size
+
+
+@case("dice_roll_many[2d20kh1+5]", [1000, 100000], [1000])
+def dice_roll_many(size):
+    expression = dice.parse("2d20kh1+5")
+    rng = random.Random(0)
+    return (lambda: expression.roll_many(size, rng)), size
+
+
+def _battle(size: int, dead_every: int = 0) -> Battle:
+    battle = Battle(verbose=False)
+    battle.add_team(Team("bench", _creatures(size, dead_every=dead_every)))
+    return battle
+
+
+@case("set_initiative", [10, 1000, 100000], [10, 1000])
+def set_initiative(size):
+    battle = _battle(size)
+    init_list = battle.get_initiative_list()
+
+    def fn():
+        battle.battle_started = False
+        battle.set_initiative(init_list, manual_init=False)
+    return fn, size
+
+
+@case("sort_turn_order", [10, 1000, 100000], [10, 1000])
+def sort_turn_order(size):
+    battle = _battle(size)
+    battle.set_initiative(battle.get_initiative_list(), manual_init=False)
+    random.shuffle(battle.turn_order)
+    return battle._sort_turn_order, size
+
+
+@case("next_turn[90% dead]", [1000, 100000], [1000])
+def next_turn_dead(size):
+    battle = _battle(size, dead_every=10)
+    battle.set_initiative(battle.get_initiative_list(), manual_init=False)
+    turns = max(size // 10, 1)
+
+    def fn():
+        for _ in range(turns):
+            battle.next_turn()
+    return fn, turns
+
+
+def _round_trip_case(save, load, suffix):
+    # The runner works inside a temporary directory
+    def setup(size):
+        team = Team("bench", _creatures(size, hp=50))
+        for creature in team:
+            creature.set_resistance("fire", "resistant")
+        path = "bench" + suffix
+
+        def fn():
+            save(team, path)
+            load(path)
+        return fn, size
+    return setup
+
+
+case("team_save_load[json]", [100, 10000], [100])(
+    _round_trip_case(Team.save, Team.load, ".json"))
+case("team_save_load[json-lazy]", [100, 10000], [100])(
+    _round_trip_case(Team.save, lambda path: Team.load(path, lazy=True), ".json"))
+case("team_save_load[binary]", [100, 10000], [100])(
+    _round_trip_case(Team.save_binary, Team.load_binary, ".team"))
+
+
+@case("autosave[10 dirty]", [100, 10000], [100])
+def autosave_dirty(size):
+    battle = _battle(size)
+    save = Autosave(battle, f"autosave{size}.db")
+    hurt = battle.all_creatures()[:10]
+
+    def fn():
+        for creature in hurt:
+            creature.damage(1)
+        save.save()
+    return fn, len(hurt), save.close
@@ -0,0 +1,145 @@
+import functools
+from collections import defaultdict
+from math import comb
+from . import dice
+from .resistances import apply_factor, damage_type_id
+
+
+def _convolve(a: dict, b: dict) -> dict:
+    out = defaultdict(int)
+    for x, ways_x in a.items():
+        for y, ways_y in b.items():
+            out[x + y] += ways_x * ways_y
+    return dict(out)
+
+
+def _term_counts(term: dice.DiceTerm) -> dict:
+    """{sum of the kept dice: number of the sides**count outcomes giving it}."""
+    if not term.keep:
+        die = {face: 1 for face in range(1, term.sides + 1)}
+        counts = {0: 1}
+        for _ in range(term.count):
+            counts = _convolve(counts, die)
+        return counts
+
+    # Assign dice to faces from the best face down, so the first dice assigned
+    # are the kept ones. States are (dice assigned, kept sum) -> ways.
+    kept = term.kept()
+    if term.keep in ("kh", "dl"):
+        faces = range(term.sides, 0, -1)
+    else:
+        faces = range(1, term.sides + 1)
+    states = {(0, 0): 1}
+    for face in faces:
+        following = defaultdict(int)
+        for (assigned, total), ways in states.items():
+            left = term.count - assigned
+            for c in range(left + 1):
+                taken = min(c, max(kept - assigned, 0))
+                following[(assigned + c, total + taken * face)] += ways * comb(left, c)
+        states = following
+    return {total: ways for (assigned, total), ways in states.items() if assigned == term.count}
+
+
+@functools.lru_cache(maxsize=256)
+def roll_counts(expression: str):
+    """Exact distribution of a dice expression as ({value: ways}, number of outcomes)."""
+    compiled = dice.parse(expression)
+    counts = {compiled.constant: 1}
+    outcomes = 1
+    for term in compiled.terms:
+        term_counts = _term_counts(term)
+        if term.sign < 0:
+            term_counts = {-value: ways for value, ways in term_counts.items()}
+        counts = _convolve(counts, term_counts)
+        outcomes *= term.sides ** term.count
+    return counts, outcomes
+
+
+@functools.lru_cache(maxsize=1024)
+def incoming_counts(expression: str, profile, damage_type: str):
+    """Damage (or healing, for heal-instead immunity) that reaches a creature with
+    the given resistance profile, as ({amount: ways}, heals, number of outcomes).
+
+    Follows Creature.damage: the multiplier rounds down and the flat modifier
+    only applies to non-zero damage.
+    """
+    counts, outcomes = roll_counts(expression)
+    multiplier, flat_modifier = profile.factor(damage_type_id(damage_type))
+    incoming = defaultdict(int)
+    if multiplier == -1:
+        for value, ways in counts.items():
+            incoming[max(value + flat_modifier, 0)] += ways
+        return dict(incoming), True, outcomes
+
+    for value, ways in counts.items():
+        incoming[max(apply_factor(value, multiplier, flat_modifier), 0)] += ways
+    return dict(incoming), False, outcomes
+
+
+class DamageDistribution:
+    """Exact outcome of one hit on a creature.
+
+    hp_lost, absorbed_by_shield and healed map each possible amount to its
+    probability; death_chance is the chance the creature is dead afterwards.
+    """
+
+    def __init__(self, hp_lost: dict, absorbed_by_shield: dict, healed: dict, death_chance: float):
+        self.hp_lost = hp_lost
+        self.absorbed_by_shield = absorbed_by_shield
+        self.healed = healed
+        self.death_chance = death_chance
+
+    def mean_hp_lost(self) -> float:
+        return sum(value * p for value, p in self.hp_lost.items())
+
+    def chance_to_lose_at_least(self, hp: int) -> float:
+        return sum(p for value, p in self.hp_lost.items() if value >= hp)
+
+    def __repr__(self):
+        return (f"DamageDistribution(mean_hp_lost={self.mean_hp_lost():.3f}, "
+                f"death_chance={self.death_chance:.4f})")
+
+
+def damage_distribution(expression, damage_type: str, target) -> DamageDistribution:
+    """Exact distribution of what a hit of expression (e.g. "8d6") does to target,
+    given its current HP, shield and resistances. Nothing is rolled and the
+    target is not changed.
+
+    The roll distribution is built by convolution and, after resistances,
+    cached per (expression, resistance profile, damage type), so only the
+    cheap HP and shield step runs again for each target.
+    """
+    incoming, heals, outcomes = incoming_counts(str(expression), target.resistances.profile, damage_type)
+    hp = target.hp
+    alive = target.alive
+
+    hp_lost = defaultdict(int)
+    absorbed = defaultdict(int)
+    healed = defaultdict(int)
+    deaths = 0
+    for amount, ways in incoming.items():
+        if heals:
+            healed[min(hp.real_hp + amount, hp.max_hp) - hp.real_hp if alive else 0] += ways
+            hp_lost[0] += ways
+            absorbed[0] += ways
+            deaths += 0 if alive else ways
+            continue
+        shield = min(amount, hp.shield)
+        lost = min(amount - shield, hp.real_hp)
+        hp_lost[lost] += ways
+        absorbed[shield] += ways
+        healed[0] += ways
+        if hp.real_hp - lost == 0:
+            deaths += ways
+
+    def probabilities(counts):
+        return {value: ways / outcomes for value, ways in sorted(counts.items())}
+
+    return DamageDistribution(probabilities(hp_lost), probabilities(absorbed), probabilities(healed),
+                              deaths / outcomes)
+
+
+def kill_chance(expression, damage_type: str, target) -> float:
+    """Chance that one hit of expression leaves target dead."""
+    return damage_distribution(expression, damage_type, target).death_chance
@@ -0,0 +1,107 @@
+from array import array
+from .resistances import apply_factor
+
+
+class BatchDamageResult:
+    """Columnar result of damaging many creatures at once.
+
+    Every column is an array with one entry per target, in target order.
+    """
+
+    COLUMNS = ("saved", "final_amount", "absorbed_by_shield", "hp_lost",
+               "healed_amount", "healed_instead", "remaining_hp", "dead")
+
+    def __init__(self, targets, damage_type: str, saved=None):
+        n = len(targets)
+        self.targets = targets
+        self.damage_type = damage_type
+        self.saved = saved if saved is not None else array("b", bytes(n))
+        self.final_amount = array("i", bytes(4 * n))
+        self.absorbed_by_shield = array("i", bytes(4 * n))
+        self.hp_lost = array("i", bytes(4 * n))
+        self.healed_amount = array("i", bytes(4 * n))
+        self.healed_instead = array("b", bytes(n))
+        self.remaining_hp = array("i", bytes(4 * n))
+        self.dead = array("b", bytes(n))
+
+    def __len__(self):
+        return len(self.targets)
+
+    def row(self, index: int) -> dict:
+        """Return one target's result as a dict, for display."""
+        result = {"target": self.targets[index].name, "type": self.damage_type}
+        for name in self.COLUMNS:
+            result[name] = getattr(self, name)[index]
+        return result
+
+    def killed(self) -> list:
+        """Return targets that are dead after the hit."""
+        return [c for c, dead in zip(self.targets, self.dead) if dead]
+
+    def total_hp_lost(self) -> int:
+        return sum(self.hp_lost)
+
+
+def damage_many(targets, amounts, damage_type: str = "true", saved=None) -> BatchDamageResult:
+    """Deal damage of one type to many creatures in a single pass.
+
+    amounts holds the incoming damage per target (after any saving throw).
+    Follows the same rules as Creature.damage: resistance multiplier and flat
+    bonus, heal-instead immunity, shield absorption and death at 0 HP.
+    Resistances are resolved once per distinct resistance profile and
+    creatures stored in a CreatureTable are updated directly in its columns.
+    """
+    result = BatchDamageResult(targets, damage_type, saved)
+    factors = {}
+
+    for i, creature in enumerate(targets):
+        profile = creature.resistances.profile
+        factor = factors.get(profile)
+        if factor is None:
+            factor = factors[profile] = creature.get_resistance(damage_type)
+        multiplier, flat_modifier = factor
+
+        if multiplier == -1:
+            # Immune, heals instead
+            result.healed_amount[i] = creature.heal(amounts[i] + flat_modifier)["healed_amount"]
+            result.healed_instead[i] = 1
+            result.remaining_hp[i] = creature.hp.real_hp
+            result.dead[i] = not creature.alive
+            continue
+
+        amount = apply_factor(amounts[i], multiplier, flat_modifier)
+        result.final_amount[i] = amount
+        amount = max(amount, 0)
+
+        table = creature._table
+        if table is None:
+            hp = creature.hp
+            shield = hp.shield
+            hp_lost = hp.take(amount)
+            absorbed = shield - hp.shield
+            remaining = hp.real_hp
+        else:
+            row = creature._row
+            absorbed = 0
+            shield = table.shield[row]
+            if shield > 0:
+                absorbed = min(amount, shield)
+                table.shield[row] = shield - absorbed
+                amount -= absorbed
+            hp_before = table.real_hp[row]
+            remaining = max(hp_before - amount, 0) if amount > 0 else hp_before
+            table.real_hp[row] = remaining
+            hp_lost = hp_before - remaining
+
+        if absorbed or hp_lost:
+            creature._notify("hp_changed")
+        result.absorbed_by_shield[i] = absorbed
+        result.hp_lost[i] = hp_lost
+        result.remaining_hp[i] = remaining
+        if remaining == 0:
+            creature.die()
+            result.dead[i] = 1
+        else:
+            result.dead[i] = not creature.alive
+
+    return result
@@ -1,107 +1,227 @@
 from .hp import HP
 from .stats import Stats
-from .resistances import Resistances
+from .resistances import MODES, Resistances, apply_factor
+from . import dice, instrumentation
+import io
 import json
+import struct
+from typing import NamedTuple
+
+# Binary record layout: alive flag, HP fields, stats and name length, followed by
+# the name, the number of non-default resistances and one entry per resistance.
+_RECORD = struct.Struct("<?4i6iH")
+_COUNT = struct.Struct("<H")
+_RESISTANCE = struct.Struct("<Bi")
+
+# Parts a lazily loaded creature builds from its raw dict on first access
+_LAZY_PARTS = {"hp": HP.from_dict, "stats": Stats.from_dict, "resistances": Resistances.from_dict}
+# Parts a creature bound to a CreatureTable reads through a view of its row
+_VIEW_PARTS = ("hp", "stats")
+
+
+class HitResult(NamedTuple):
+    """Outcome of Creature.hit."""
+    final_amount: int        # damage after resistances, before the shield
+    absorbed_by_shield: int
+    hp_lost: int
+    healed: int              # HP healed by a heal-instead immunity
+    remaining_hp: int
+    dead: bool
+    healed_instead: bool
 
 
 class Creature:
+    __slots__ = ("name", "hp", "stats", "resistances", "_alive", "_table", "_row", "_listeners", "_raw")
+
     def __init__(self, name: str, hp: HP = None, stats: Stats = None, resistances: Resistances = None, alive: bool = True):
         self.name = name
         self.hp = hp if hp is not None else HP()
         self.stats = stats if stats is not None else Stats()
         self.resistances = resistances if resistances is not None else Resistances()
-        self.alive = alive
+        self._alive = alive
+        # Set when the creature is a view over a CreatureTable row
+        self._table = None
+        self._row = -1
+        # Callbacks taking (event, creature), e.g. a Battle following deaths
+        self._listeners = []
+        # Raw dicts of the parts a lazily loaded creature hasn't built yet
+        self._raw = None
+
+    @classmethod
+    def _from_raw(cls, name: str, alive: bool, raw: dict):
+        """Creature whose hp, stats and resistances are built from raw when first used."""
+        creature = cls.__new__(cls)
+        creature.name = name
+        creature._alive = alive
+        creature._table = None
+        creature._row = -1
+        creature._listeners = []
+        creature._raw = raw or None
+        return creature
+
+    def __getattr__(self, name):
+        # Only called for missing attributes
+        if name in _VIEW_PARTS and self._table is not None:
+            # Views are cheap to make, so table rows don't keep one per creature
+            return self._table.view(name, self._row)
+        # Build a lazy part on first access
+        build = _LAZY_PARTS.get(name)
+        raw = self._raw if build is not None else None
+        if raw is None or name not in raw:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        value = build(raw.pop(name))
+        if not raw:
+            self._raw = None
+        setattr(self, name, value)
+        return value
+
+    def __getstate__(self):
+        # Only the slots that are set: reading the others would make table
+        # views or build lazy parts just to pickle them
+        slots = {}
+        for name in self.__slots__:
+            try:
+                slots[name] = object.__getattribute__(self, name)
+            except AttributeError:
+                pass
+        return None, slots
+
+    def raw_part(self, name: str):
+        """Raw dict of a lazily loaded part that hasn't been built yet, else None."""
+        raw = self._raw
+        return None if raw is None else raw.get(name)
+
+    @property
+    def alive(self) -> bool:
+        if self._table is None:
+            return self._alive
+        return bool(self._table.alive[self._row])
+
+    @alive.setter
+    def alive(self, value: bool):
+        if self._table is None:
+            self._alive = value
+        else:
+            self._table.alive[self._row] = value
 
     # Delegated HP actions
-    def damage(self, amount: int, damage_type: str = "true") -> dict:
+    def hit(self, amount, damage_type: str = "true", rng=None, record: bool = True):
+        """Fast path of damage(): the same rules without building result dicts.
+
+        Returns a HitResult, or None if record is False.
+        """
+        if amount.__class__ is str:
+            amount = dice.parse(amount).roll(rng)
+        multiplier, flat_modifier = self.resistances.get_factor(damage_type)
+        hp = self.hp
+
+        if multiplier == -1:
+            # Immune, heals instead
+            healed = 0
+            if self.alive:
+                healed = hp.restore(amount + flat_modifier)
+                self._notify("hp_changed")
+            if record:
+                return HitResult(0, 0, 0, healed, hp.real_hp, not self.alive, True)
+            return None
+
+        amount = apply_factor(amount, multiplier, flat_modifier)
+        shield = hp.shield
+        hp_lost = hp.take(amount)
+        self._notify("hp_changed")
+        if hp.real_hp == 0:
+            self.die()
+        if record:
+            return HitResult(amount, shield - hp.shield, hp_lost, 0, hp.real_hp, not self.alive, False)
+        return None
+
+    def damage(self, amount, damage_type: str = "true", rng=None) -> dict:
         """
         Deal damage to the creature and return detailed results for the GUI.
+        amount is a number or a dice expression such as "2d6+3", rolled with rng.
         """
+        amount = dice.roll(amount, rng)
+        multiplier, flat_modifier = self.get_resistance(damage_type)
+        hit = self.hit(amount, damage_type)
         result = {
             "target": self.name,
             "type": damage_type,
             "initial_amount": amount,
-            "final_amount": 0,
-            "resist_multiplier": None,
-            "resist_bonus": None,
-            "absorbed_by_shield": 0,
-            "hp_lost": 0,
-            "remaining_hp": self.hp.real_hp,
+            "final_amount": hit.final_amount,
+            "resist_multiplier": multiplier,
+            "resist_bonus": flat_modifier,
+            "absorbed_by_shield": hit.absorbed_by_shield,
+            "hp_lost": hit.hp_lost,
+            "remaining_hp": hit.remaining_hp,
             "remaining_shield": self.hp.shield,
-            "healed_instead": False,
-            "dead": not self.alive
+            "healed_instead": hit.healed_instead,
+            "dead": hit.dead
         }
-
-        damage_resist = self.get_resistance(damage_type)
-        result["resist_multiplier"] = damage_resist[0]
-        result["resist_bonus"] = damage_resist[1]
-
-        if damage_resist[0] == -1:
-            # Immune, heals instead
-            heal_amount = amount + damage_resist[1]
-            heal_result = self.heal(heal_amount)
-            result.update({
-                "healed_instead": True,
-                "heal_amount": heal_result["healed_amount"],
-                "remaining_hp": heal_result["remaining_hp"]
-            })
+        if hit.healed_instead:
+            result["heal_amount"] = hit.healed
         else:
-            amount = amount * damage_resist[0]
-            if amount:
-                amount = amount + damage_resist[1]
-            result["final_amount"] = amount
-
-            dmg_result = self.hp.damage(amount)
-            result.update(dmg_result)
-
-            if self.hp.real_hp == 0:
-                self.die()
-                result["dead"] = True
-
+            result["initial_damage"] = max(hit.final_amount, 0)
         return result
 
     def heal(self, amount: int) -> dict:
         """
         Heal the creature and return detailed results for the GUI.
         """
+        healed_amount = 0
         if self.alive:
-            heal_result = self.hp.heal(amount)
-            return {
-                "target": self.name,
-                "healed_amount": heal_result["healed_amount"],
-                "remaining_hp": heal_result["remaining_hp"]
-            }
-        else:
-            return {
-                "target": self.name,
-                "healed_amount": 0,
-                "remaining_hp": self.hp.real_hp
-            }
+            healed_amount = self.hp.restore(amount)
+            self._notify("hp_changed")
+        return {
+            "target": self.name,
+            "healed_amount": healed_amount,
+            "remaining_hp": self.hp.real_hp
+        }
 
     def change_temp(self, amount: int):
         if self.alive:
             self.hp.change_temp(amount)
+            self._notify("hp_changed")
 
     def change_max(self, amount: int):
         if self.alive:
             self.hp.change_max(amount)
+            self._notify("hp_changed")
 
     def set_real(self, value: int):
         self.hp.set_real(value)
+        self._notify("hp_changed")
 
     def set_max(self, value: int):
         self.hp.set_max(value)
+        self._notify("hp_changed")
 
     def set_temp(self, value: int):
         self.hp.set_temp(value)
+        self._notify("hp_changed")
 
     def die(self):
         self.alive = False
         self.hp.real_hp = 0
+        self._notify("died")
 
     def resurrect(self):
         self.alive = True
         self.set_real(1)
+        self._notify("resurrected")
+
+    # listeners
+    def add_listener(self, listener):
+        """Register a callback(event, creature) for 'hp_changed', 'died', 'resurrected'
+        and 'resistances_changed' events."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, event: str):
+        for listener in self._listeners:
+            listener(event, self)
 
     # Stats access
     def __getitem__(self, key):
@@ -118,38 +238,77 @@ class Creature:
 
     # resistances
     def get_resistance(self, damage_type: str) -> tuple[int, int]:
-        mode, flat_modifier = self.resistances.get_resistance(damage_type)
-
-        multiplier_map = {
-            "immune": 0,
-            "resistant": 0.5,
-            "normal": 1,
-            "vulnerable": 2,
-            "heal": -1
-        }
-        multiplier = multiplier_map.get(mode, 2)  # default to normal if unknown mode
-
-        return multiplier, flat_modifier
+        """Return (multiplier, flat_modifier) for a damage type."""
+        return self.resistances.get_factor(damage_type)
 
     def set_resistance(self, damage_type: str, mode: str, flat_modifier: int = 0):
         """Set this creature's resistance."""
         self.resistances.set_resistance(damage_type, mode, flat_modifier)
+        self._notify("resistances_changed")
+
+    def copy(self):
+        """Return an independent copy. The resistance profile is shared, being copy-on-write,
+        and parts a lazily loaded creature hasn't built yet stay raw in the copy."""
+        raw = self._raw or {}
+        creature = Creature._from_raw(self.name, self.alive, dict(raw))
+        if "hp" not in raw:
+            hp = HP(self.hp.max_hp, self.hp.real_hp, shield=self.hp.shield)
+            hp.temp_hp = self.hp.temp_hp
+            creature.hp = hp
+        if "stats" not in raw:
+            creature.stats = Stats(**self.stats.to_dict())
+        if "resistances" not in raw:
+            resistances = Resistances()
+            resistances.profile = self.resistances.profile
+            creature.resistances = resistances
+        return creature
 
     # json
-    def to_dict(self):
+    def to_dict(self, sparse: bool = False):
+        """Convert to a plain dictionary. If sparse, default stats and resistances are left out.
+
+        Parts of a lazily loaded creature that were never used are written from
+        the loaded dict without building them.
+        """
+        raw = self._raw
+        if raw is None:
+            return {
+                "name": self.name,
+                "alive": self.alive,
+                "hp": self.hp.to_dict(),
+                "stats": self.stats.to_dict(sparse),
+                "resistances": self.resistances.to_dict(sparse),
+            }
         return {
             "name": self.name,
             "alive": self.alive,
-            "hp": self.hp.to_dict(),
-            "stats": self.stats.to_dict(),
-            "resistances": self.resistances.to_dict(),
+            "hp": HP.dict_from_raw(raw["hp"]) if "hp" in raw else self.hp.to_dict(),
+            "stats": Stats.dict_from_raw(raw["stats"], sparse) if "stats" in raw else self.stats.to_dict(sparse),
+            "resistances": (Resistances.dict_from_raw(raw["resistances"], sparse)
+                            if "resistances" in raw else self.resistances.to_dict(sparse)),
         }
 
     def to_json(self):
         return json.dumps(self.to_dict())
 
     @classmethod
-    def from_dict(cls, data: dict):
+    def from_dict(cls, data: dict, lazy: bool = False, shared: dict = None):
+        """Build a creature from a dict.
+
+        lazy keeps hp, stats and resistances as raw dicts until they are first
+        used, for big rosters where most creatures stay untouched. Passing the
+        same shared dict while loading a roster makes creatures with identical
+        stats or resistance tables keep one raw copy between them.
+        """
+        if lazy:
+            raw = {part: data[part] for part in _LAZY_PARTS}
+            if shared is not None:
+                stats = raw["stats"]
+                raw["stats"] = shared.setdefault(tuple(stats.items()), stats)
+                resistances = raw["resistances"]
+                key = tuple((dtype, info["mode"], info["flat_modifier"]) for dtype, info in resistances.items())
+                raw["resistances"] = shared.setdefault(key, resistances)
+            return cls._from_raw(data.get("name"), data.get("alive", True), raw)
         hp = HP.from_dict(data["hp"])
         stats = Stats.from_dict(data["stats"])
         resistances = Resistances.from_dict(data["resistances"])
@@ -162,9 +321,56 @@ class Creature:
         data = json.loads(json_str)
         return cls.from_dict(data)
 
-    def save(self, filename: str):
+    # binary
+    def to_bytes(self) -> bytes:
+        """Pack the creature into a compact binary record."""
+        hp, stats = self.hp, self.stats
+        name = self.name.encode("utf-8")
+        overrides = list(self.resistances.overrides())
+        parts = [
+            _RECORD.pack(self.alive, hp.max_hp, hp.real_hp, hp.temp_hp, hp.shield,
+                         stats.STR, stats.DEX, stats.CON, stats.WIS, stats.INT, stats.CHA,
+                         len(name)),
+            name,
+            _COUNT.pack(len(overrides)),
+        ]
+        for damage_type, (mode, flat_modifier) in overrides:
+            damage_type = damage_type.encode("utf-8")
+            parts += [bytes((len(damage_type),)), damage_type,
+                      _RESISTANCE.pack(MODES.index(mode), flat_modifier)]
+        return b"".join(parts)
+
+    @classmethod
+    def read_bytes(cls, stream):
+        """Read one binary record from a stream. Returns None at end of stream."""
+        header = stream.read(_RECORD.size)
+        if not header:
+            return None
+        if len(header) < _RECORD.size:
+            raise ValueError("Truncated creature record.")
+
+        alive, max_hp, real_hp, temp_hp, shield, *stats, name_len = _RECORD.unpack(header)
+        name = stream.read(name_len).decode("utf-8")
+        (count,) = _COUNT.unpack(stream.read(_COUNT.size))
+        values = {}
+        for _ in range(count):
+            damage_type = stream.read(stream.read(1)[0]).decode("utf-8")
+            mode, flat_modifier = _RESISTANCE.unpack(stream.read(_RESISTANCE.size))
+            values[damage_type] = (MODES[mode], flat_modifier)
+
+        return cls(name=name, hp=HP(max_hp, real_hp, temp_hp, shield), stats=Stats(*stats),
+                   resistances=Resistances(values), alive=alive)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        return cls.read_bytes(io.BytesIO(data))
+
+    def save(self, filename: str, sparse: bool = False):
         with open(filename, "w", encoding="utf-8") as f:
-            json.dump(self.to_dict(), f, indent=4)
+            if sparse:
+                json.dump(self.to_dict(sparse=True), f, separators=(",", ":"))
+            else:
+                json.dump(self.to_dict(), f, indent=4)
 
     @classmethod
     def load(cls, filename: str):
@@ -177,6 +383,10 @@ class Creature:
               f"\nStats: {self.stats} \nResistances: {self.resistances}")
 
 
+instrumentation.instrument(Creature, "damage", "heal", "to_dict", "from_dict", "to_bytes", "read_bytes",
+                           "save", "load")
+
+
 if __name__ == '__main__':
     creature = Creature("man")
     creature.greet()
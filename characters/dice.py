@@ -0,0 +1,130 @@
+import functools
+import operator
+import random
+import re
+from array import array
+from typing import NamedTuple
+
+# One term of an expression: "8d6", "2d20kh1", "4d6dl1", "d8" or a constant
+_TERM = re.compile(r"\s*([+-])?\s*(?:(\d*)d(\d+)(?:(kh|kl|dh|dl)(\d*))?|(\d+))\s*", re.IGNORECASE)
+
+
+class DiceTerm(NamedTuple):
+    """count dice with sides faces, keeping only some of them for kh/kl/dh/dl."""
+    sign: int          # 1 or -1
+    count: int
+    sides: int
+    keep: str = None   # None, "kh", "kl", "dh" or "dl"
+    keep_count: int = 0
+
+    def kept(self) -> int:
+        """Number of dice that count towards the total."""
+        if self.keep in ("kh", "kl"):
+            return self.keep_count
+        if self.keep in ("dh", "dl"):
+            return self.count - self.keep_count
+        return self.count
+
+    def select(self, rolls: list) -> list:
+        """The rolls that count, for a term with a keep/drop suffix."""
+        rolls = sorted(rolls)
+        if self.keep == "kh":
+            return rolls[len(rolls) - self.keep_count:]
+        if self.keep == "kl":
+            return rolls[:self.keep_count]
+        if self.keep == "dh":
+            return rolls[:len(rolls) - self.keep_count]
+        return rolls[self.keep_count:]
+
+
+class Dice:
+    """A compiled dice expression such as "8d6+3", "2d20kh1+5" or "4d6dl1".
+
+    Use parse() rather than the constructor, so every expression is parsed once.
+    """
+
+    def __init__(self, expression: str, terms, constant: int):
+        self.expression = expression
+        self.terms = tuple(terms)
+        self.constant = constant
+
+    def __repr__(self):
+        return f"Dice({self.expression!r})"
+
+    def __str__(self):
+        return self.expression
+
+    @property
+    def min(self) -> int:
+        return self.constant + sum(t.kept() if t.sign > 0 else -t.kept() * t.sides for t in self.terms)
+
+    @property
+    def max(self) -> int:
+        return self.constant + sum(t.kept() * t.sides if t.sign > 0 else -t.kept() for t in self.terms)
+
+    def roll(self, rng: random.Random = None) -> int:
+        """Roll the expression once."""
+        choices = (rng or random).choices
+        total = self.constant
+        for term in self.terms:
+            rolls = choices(range(1, term.sides + 1), k=term.count)
+            if term.keep:
+                rolls = term.select(rolls)
+            total += term.sign * sum(rolls)
+        return total
+
+    def roll_many(self, n: int, rng: random.Random = None) -> array:
+        """Roll the expression n times, drawing every die of a term in one call."""
+        choices = (rng or random).choices
+        totals = [self.constant] * n
+        for term in self.terms:
+            count = term.count
+            rolls = choices(range(1, term.sides + 1), k=n * count)
+            if term.keep:
+                values = [sum(term.select(rolls[i:i + count])) for i in range(0, n * count, count)]
+            elif count == 1:
+                values = rolls
+            else:
+                values = list(map(sum, zip(*[iter(rolls)] * count)))
+            totals = list(map(operator.add if term.sign > 0 else operator.sub, totals, values))
+        return array("i", totals)
+
+
+@functools.lru_cache(maxsize=1024)
+def parse(expression: str) -> Dice:
+    """Compile a dice expression, e.g. "8d6+3", "2d20kh1+5", "4d6dl1" or "12".
+
+    Terms are NdM (N defaults to 1) with an optional kh/kl (keep highest/lowest)
+    or dh/dl (drop highest/lowest) suffix and count (default 1), or a constant,
+    joined by + or -. Raises ValueError for anything else.
+    """
+    terms = []
+    constant = 0
+    pos = 0
+    while pos < len(expression):
+        match = _TERM.match(expression, pos)
+        if match is None or pos and not match.group(1):
+            raise ValueError(f"Invalid dice expression: {expression!r}")
+        sign, count, sides, keep, keep_count, number = match.groups()
+        sign = -1 if sign == "-" else 1
+        if number is not None:
+            constant += sign * int(number)
+        else:
+            count = int(count) if count else 1
+            sides = int(sides)
+            keep = keep.lower() if keep else None
+            keep_count = (int(keep_count) if keep_count else 1) if keep else 0
+            if count < 1 or sides < 1 or keep_count > count:
+                raise ValueError(f"Invalid dice expression: {expression!r}")
+            terms.append(DiceTerm(sign, count, sides, keep, keep_count))
+        pos = match.end()
+    if pos == 0:
+        raise ValueError(f"Invalid dice expression: {expression!r}")
+    return Dice(expression.strip(), terms, constant)
+
+
+def roll(amount, rng: random.Random = None) -> int:
+    """Return amount if it is already a number, else roll it as a dice expression."""
+    if isinstance(amount, str):
+        return parse(amount).roll(rng)
+    return amount
@@ -1,4 +1,9 @@
+import math
+
+
 class HP:
+    __slots__ = ("max_hp", "real_hp", "temp_hp", "shield")
+
     def __init__(self, max_hp: int = 1, real_hp: int = 1, temp_hp: int = 0, shield: int = 0):
         self.max_hp = max_hp
         self.real_hp = real_hp
@@ -8,40 +13,43 @@ class HP:
             self.temp_hp = temp_hp
         self.shield = shield
 
+    def take(self, damage: int) -> int:
+        """Apply damage, shield first, and return the HP lost. No result dict is built."""
+        if damage <= 0:
+            return 0
+        shield = self.shield
+        if shield > 0:
+            absorbed = damage if damage < shield else shield
+            self.shield = shield - absorbed
+            damage -= absorbed
+            if not damage:
+                return 0
+        hp_before = self.real_hp
+        self.real_hp = hp_before - damage if hp_before > damage else 0
+        return hp_before - self.real_hp
+
+    def restore(self, amount: int) -> int:
+        """Heal up to max HP and return the HP healed."""
+        hp_before = self.real_hp
+        self.real_hp = min(hp_before + max(amount, 0), self.max_hp)
+        return self.real_hp - hp_before
+
     def damage(self, damage: int) -> dict:
         damage = max(damage, 0)
-        result = {
+        shield_before = self.shield
+        hp_lost = self.take(damage)
+        absorbed = shield_before - self.shield
+        return {
             "initial_damage": damage,
-            "absorbed_by_shield": 0,
-            "hp_lost": 0,
+            "absorbed_by_shield": absorbed,
+            "hp_lost": hp_lost,
             "remaining_shield": self.shield,
             "remaining_hp": self.real_hp,
-            "dead": False
+            "dead": damage > absorbed and self.real_hp == 0
         }
 
-        if self.shield > 0:
-            absorbed = min(damage, self.shield)
-            self.shield -= absorbed
-            damage -= absorbed
-            result["absorbed_by_shield"] = absorbed
-            result["remaining_shield"] = self.shield
-
-        if damage > 0:
-            hp_before = self.real_hp
-            self.real_hp = max(self.real_hp - damage, 0)
-            result["hp_lost"] = hp_before - self.real_hp
-            result["remaining_hp"] = self.real_hp
-            if self.real_hp == 0:
-                result["dead"] = True
-
-        return result
-
     def heal(self, amount: int) -> dict:
-        amount = max(amount, 0)
-        hp_before = self.real_hp
-        self.real_hp = min(self.real_hp + amount, self.max_hp)
-        healed_amount = self.real_hp - hp_before
-
+        healed_amount = self.restore(amount)
         return {
             "healed_amount": healed_amount,
             "remaining_hp": self.real_hp
@@ -83,7 +91,14 @@ class HP:
 
     @classmethod
     def from_dict(cls, data: dict):
-        return cls(**data)
+        """Build HP from a dict, keeping it integral. Files saved before damage
+        was rounded down can hold fractional HP, which is rounded down too."""
+        return cls(**{key: _whole(key, value) for key, value in data.items()})
+
+    @classmethod
+    def dict_from_raw(cls, data: dict) -> dict:
+        """What to_dict would return for an HP dict that was never built into HP."""
+        return {key: _whole(key, value) for key, value in data.items()}
 
     def __getitem__(self, key):
         if not hasattr(self, key):
@@ -93,3 +108,12 @@ class HP:
     def __str__(self):
         return f"{self.real_hp}/{self.max_hp}hp (+{self.temp_hp} temp, {self.shield} shield)"
 
+
+def _whole(key: str, value) -> int:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError(f"HP field {key} must be a number, not {value!r}.")
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError(f"HP field {key} must be finite, not {value!r}.")
+        return math.floor(value)
+    return value
@@ -0,0 +1,181 @@
+"""Optional call counters, latency histograms and profiling for the hot paths.
+
+Classes register the methods worth watching with instrument(). Nothing is
+wrapped until enable() is called (or DND_INSTRUMENT=1 is set before import),
+so a disabled build runs the original methods with no overhead at all.
+
+    from characters import instrumentation
+    instrumentation.enable()
+    ... run a session ...
+    instrumentation.export_json("calls.json")
+
+profile() runs a block under cProfile and saves its stats for snakeviz,
+gprof2dot or flameprof.
+"""
+import contextlib
+import functools
+import json
+import os
+import time
+
+# (class, method name) pairs registered by instrument()
+_registered = []
+# (class, method name) -> original attribute from the class __dict__
+_originals = {}
+# "Class.method" -> CallStats
+_stats = {}
+_enabled = False
+
+
+class CallStats:
+    """Call count, total time and a log2 latency histogram for one method."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+        # Bucket b counts calls that took [2**(b-1), 2**b) nanoseconds
+        self.buckets = {}
+
+    def record(self, elapsed_ns: int):
+        self.calls += 1
+        self.total_ns += elapsed_ns
+        if self.min_ns is None or elapsed_ns < self.min_ns:
+            self.min_ns = elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        bucket = elapsed_ns.bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, fraction: float) -> int:
+        """Upper bound in nanoseconds of the histogram bucket holding the given fraction of calls."""
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= fraction * self.calls:
+                return min(1 << bucket, self.max_ns)
+        return self.max_ns
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "total_ms": self.total_ns / 1e6,
+            "mean_us": self.total_ns / self.calls / 1e3 if self.calls else 0,
+            "min_us": (self.min_ns or 0) / 1e3,
+            "p50_us": self.percentile(0.5) / 1e3,
+            "p90_us": self.percentile(0.9) / 1e3,
+            "p99_us": self.percentile(0.99) / 1e3,
+            "max_us": self.max_ns / 1e3,
+            "histogram_ns": {str(1 << bucket): count for bucket, count in sorted(self.buckets.items())},
+        }
+
+
+def _wrap(cls, name: str):
+    original = cls.__dict__[name]
+    kind = type(original) if isinstance(original, (classmethod, staticmethod)) else None
+    func = original.__func__ if kind else original
+    stats = _stats.setdefault(f"{cls.__name__}.{name}", CallStats(f"{cls.__name__}.{name}"))
+    clock = time.perf_counter_ns
+
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        start = clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats.record(clock() - start)
+
+    _originals[(cls, name)] = original
+    setattr(cls, name, kind(timed) if kind else timed)
+
+
+def instrument(cls, *names: str):
+    """Register methods of cls to be counted and timed while instrumentation is enabled."""
+    for name in names:
+        _registered.append((cls, name))
+        if _enabled:
+            _wrap(cls, name)
+
+
+def enable():
+    """Start counting and timing every registered method."""
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    for cls, name in _registered:
+        _wrap(cls, name)
+
+
+def disable():
+    """Put the original methods back. Collected stats are kept until reset()."""
+    global _enabled
+    _enabled = False
+    for (cls, name), original in _originals.items():
+        setattr(cls, name, original)
+    _originals.clear()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    _stats.clear()
+    if _enabled:
+        disable()
+        enable()
+
+
+def report() -> list:
+    """Stats of every method called so far, slowest total first."""
+    return [stats.to_dict() for stats in sorted(_stats.values(), key=lambda s: -s.total_ns) if stats.calls]
+
+
+def export_json(filename: str):
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(report(), f, indent=4)
+
+
+CSV_FIELDS = ("name", "calls", "total_ms", "mean_us", "min_us", "p50_us", "p90_us", "p99_us", "max_us")
+
+
+def export_csv(filename: str):
+    import csv
+
+    with open(filename, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(report())
+
+
+@contextlib.contextmanager
+def profile(filename: str, top: int = 0):
+    """Run the block under cProfile and dump the stats to filename.
+
+    The .prof file opens in snakeviz, or becomes a flamegraph with flameprof or
+    gprof2dot. top > 0 also prints the slowest functions by cumulative time.
+    """
+    # pstats pulls in most of the stdlib, so it is only imported when profiling
+    import cProfile
+    import io
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(filename)
+        if top:
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top)
+            print(out.getvalue())
+
+
+if os.environ.get("DND_INSTRUMENT", "") not in ("", "0"):
+    enable()
@@ -1,37 +1,180 @@
-from dataclasses import dataclass, field
-from typing import Dict, Tuple
+import math
+import weakref
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+# Interned damage types: the position in DAMAGE_TYPES is the type's ID.
+# Types outside the default set get the next free ID the first time they're used.
+DAMAGE_TYPES: List[str] = [
+    "true", "bludgeoning", "bludgeoning_magic", "piercing", "piercing_magic",
+    "slashing", "slashing_magic", "acid", "acid_magic", "cold", "cold_magic",
+    "fire", "fire_magic", "force", "force_magic", "lightning", "lightning_magic",
+    "necrotic", "necrotic_magic", "poison", "poison_magic", "psychic",  "psychic_magic",
+    "radiant", "radiant_magic", "thunder", "thunder_magic",
+]
+DAMAGE_TYPE_IDS: Dict[str, int] = {dtype: i for i, dtype in enumerate(DAMAGE_TYPES)}
+DEFAULT_TYPE_COUNT = len(DAMAGE_TYPES)
+
+MULTIPLIERS = {
+    "immune": 0,
+    "resistant": 0.5,
+    "normal": 1,
+    "vulnerable": 2,
+    "heal": -1
+}
+MODES = ("normal", "resistant", "vulnerable", "immune", "heal")
+# Multiplier of a mode missing from MULTIPLIERS, e.g. from a hand-edited team file
+UNKNOWN_MODE_MULTIPLIER = 2
+NORMAL = ("normal", 0)
+NORMAL_FACTOR = (1, 0)
+
+
+def damage_type_id(damage_type: str) -> int:
+    """Return the ID of a damage type, interning it if it is new."""
+    type_id = DAMAGE_TYPE_IDS.get(damage_type)
+    if type_id is None:
+        type_id = len(DAMAGE_TYPES)
+        DAMAGE_TYPES.append(damage_type)
+        DAMAGE_TYPE_IDS[damage_type] = type_id
+    return type_id
+
+
+def apply_factor(amount: int, multiplier, flat_modifier: int) -> int:
+    """Damage left after a (multiplier, flat_modifier) factor other than heal-instead.
+
+    The multiplier rounds down (towards minus infinity), so halved odd damage
+    loses the half point and HP stays integral, which CreatureTable columns,
+    batch results and the binary roster format rely on. The flat modifier only
+    applies to non-zero damage.
+    """
+    amount = math.floor(amount * multiplier)
+    if amount:
+        amount = amount + flat_modifier
+    return amount
+
+
+class ResistanceProfile:
+    """Immutable, interned table of resistances indexed by damage type ID.
+
+    entries[i] is the (mode, flat_modifier) set for type i, or None if the
+    type was never set. factors[i] holds the matching (multiplier, flat_modifier)
+    so a hit costs one indexed lookup. Identical profiles are the same object
+    while any of them is in use; the intern table only holds weak references.
+    """
+
+    _interned = weakref.WeakValueDictionary()
+
+    def __init__(self, entries: tuple):
+        self.entries = entries
+        self.factors = tuple(None if entry is None
+                             else (MULTIPLIERS.get(entry[0], UNKNOWN_MODE_MULTIPLIER), entry[1])
+                             for entry in entries)
+
+    @classmethod
+    def intern(cls, entries) -> "ResistanceProfile":
+        entries = list(entries)
+        while len(entries) > DEFAULT_TYPE_COUNT and entries[-1] is None:
+            entries.pop()
+        entries = tuple(entries)
+        profile = cls._interned.get(entries)
+        if profile is None:
+            profile = cls(entries)
+            cls._interned[entries] = profile
+        return profile
+
+    def get(self, type_id: int) -> Tuple[str, int]:
+        if type_id < len(self.entries):
+            entry = self.entries[type_id]
+            if entry is not None:
+                return entry
+        return NORMAL
+
+    def factor(self, type_id: int) -> Tuple[float, int]:
+        if type_id < len(self.factors):
+            factor = self.factors[type_id]
+            if factor is not None:
+                return factor
+        return NORMAL_FACTOR
+
+    def items(self):
+        """Yield (damage_type, (mode, flat_modifier)) for every set entry."""
+        for type_id, entry in enumerate(self.entries):
+            if entry is not None:
+                yield DAMAGE_TYPES[type_id], entry
+
+
+DEFAULT_PROFILE = ResistanceProfile.intern([NORMAL] * DEFAULT_TYPE_COUNT)
 
 
-@dataclass
 class Resistances:
-    values: Dict[str, Tuple[str, int]] = field(default_factory=dict)
+    """A creature's resistances, backed by a shared copy-on-write profile."""
+
+    __slots__ = ("profile",)
+
+    def __init__(self, values: Optional[Dict[str, Tuple[str, int]]] = None):
+        if not values:
+            self.profile = DEFAULT_PROFILE
+            return
 
-    def __post_init__(self):
         # Default setup for all damage types
-        damage_types = [
-            "true", "bludgeoning", "bludgeoning_magic", "piercing", "piercing_magic",
-            "slashing", "slashing_magic", "acid", "acid_magic", "cold", "cold_magic",
-            "fire", "fire_magic", "force", "force_magic", "lightning", "lightning_magic",
-            "necrotic", "necrotic_magic", "poison", "poison_magic", "psychic",  "psychic_magic",
-            "radiant", "radiant_magic", "thunder", "thunder_magic",
-        ]
-        for dmg_type in damage_types:
-            self.values.setdefault(dmg_type, ("normal", 0))
+        entries = list(DEFAULT_PROFILE.entries)
+        for dtype, (mode, flat) in values.items():
+            type_id = damage_type_id(dtype)
+            entries.extend([None] * (type_id + 1 - len(entries)))
+            entries[type_id] = (mode, flat)
+        self.profile = ResistanceProfile.intern(entries)
+
+    @property
+    def values(self) -> Mapping[str, Tuple[str, int]]:
+        """Read-only {damage_type: (mode, flat_modifier)} view of the profile.
+
+        Unlike the old dataclass field it can't be changed in place, since the
+        profile is shared: use set_resistance() or assign a whole new dict.
+        """
+        return MappingProxyType(dict(self.profile.items()))
+
+    @values.setter
+    def values(self, values: Dict[str, Tuple[str, int]]):
+        self.profile = Resistances(values).profile
 
     def set_resistance(self, damage_type: str, mode: str, flat_modifier: int):
         """Set the resistance for a given damage type."""
-        if mode not in ("normal", "resistant", "vulnerable", "immune", "heal"):
+        if mode not in MODES:
             raise ValueError("Invalid mode. Must be 'normal', 'resistant', 'vulnerable', 'immune' or 'heal'.")
-        self.values[damage_type] = (mode, flat_modifier)
+        type_id = damage_type_id(damage_type)
+        entries = list(self.profile.entries)
+        entries.extend([None] * (type_id + 1 - len(entries)))
+        entries[type_id] = (mode, flat_modifier)
+        self.profile = ResistanceProfile.intern(entries)
 
     def get_resistance(self, damage_type: str) -> Tuple[str, int]:
         """Get the resistance (mode, flat_modifier) for a given damage type."""
-        return self.values.get(damage_type, ("normal", 0))
+        type_id = DAMAGE_TYPE_IDS.get(damage_type)
+        if type_id is None:
+            return NORMAL
+        return self.profile.get(type_id)
 
-    def to_dict(self):
-        """Convert to a plain dictionary (ready for JSON)."""
+    def get_factor(self, damage_type: str) -> Tuple[float, int]:
+        """Get the (multiplier, flat_modifier) applied to a given damage type."""
+        type_id = DAMAGE_TYPE_IDS.get(damage_type)
+        if type_id is None:
+            return NORMAL_FACTOR
+        return self.profile.factor(type_id)
+
+    def overrides(self):
+        """Yield (damage_type, (mode, flat_modifier)) for entries that differ from the defaults."""
+        for type_id, entry in enumerate(self.profile.entries):
+            if entry is not None and (entry != NORMAL or type_id >= DEFAULT_TYPE_COUNT):
+                yield DAMAGE_TYPES[type_id], entry
+
+    def to_dict(self, sparse: bool = False):
+        """Convert to a plain dictionary (ready for JSON).
+
+        If sparse, only entries that differ from the defaults are written.
+        """
+        items = self.overrides() if sparse else self.profile.items()
         return {dtype: {"mode": mode, "flat_modifier": flat}
-                for dtype, (mode, flat) in self.values.items()}
+                for dtype, (mode, flat) in items}
 
     @classmethod
     def from_dict(cls, data: Dict[str, Dict[str, int]]):
@@ -39,3 +182,20 @@ class Resistances:
         values = {dtype: (info["mode"], info["flat_modifier"])
                   for dtype, info in data.items()}
         return cls(values=values)
+
+    @classmethod
+    def dict_from_raw(cls, data: Dict[str, Dict[str, int]], sparse: bool = False):
+        """What to_dict would return for a resistances dict that was never built into Resistances."""
+        if sparse:
+            defaults = DAMAGE_TYPES[:DEFAULT_TYPE_COUNT]
+            return {dtype: dict(info) for dtype, info in data.items()
+                    if (info["mode"], info["flat_modifier"]) != NORMAL or dtype not in defaults}
+        return cls.from_dict(data).to_dict()
+
+    def __eq__(self, other):
+        if not isinstance(other, Resistances):
+            return NotImplemented
+        return self.profile is other.profile
+
+    def __repr__(self):
+        return f"Resistances(values={dict(self.profile.items())!r})"
@@ -1,7 +1,7 @@
 from dataclasses import dataclass, fields
 
 
-@dataclass
+@dataclass(slots=True)
 class Stats:
     STR: int = 10
     DEX: int = 10
@@ -33,13 +33,25 @@ class Stats:
         setattr(self, stat_name, current + amount)
 
     # json
-    def to_dict(self):
+    def to_dict(self, sparse: bool = False):
+        """Convert to a plain dictionary. If sparse, default stats are left out."""
+        if sparse:
+            return {field.name: getattr(self, field.name) for field in fields(self)
+                    if getattr(self, field.name) != field.default}
         return {field.name: getattr(self, field.name) for field in fields(self)}
 
     @classmethod
     def from_dict(cls, data: dict):
         return cls(**data)
 
+    @classmethod
+    def dict_from_raw(cls, data: dict, sparse: bool = False) -> dict:
+        """What to_dict would return for a stats dict that was never built into Stats."""
+        if sparse:
+            defaults = {field.name: field.default for field in fields(cls)}
+            return {name: value for name, value in data.items() if value != defaults.get(name)}
+        return cls.from_dict(data).to_dict()
+
     def __getitem__(self, key):
         key = key.upper()
         if not hasattr(self, key):
@@ -0,0 +1,115 @@
+from array import array
+
+from .hp import HP
+from .stats import Stats
+
+HP_FIELDS = ("max_hp", "real_hp", "temp_hp", "shield")
+STAT_FIELDS = ("STR", "DEX", "CON", "WIS", "INT", "CHA")
+
+
+def _column(name: str) -> property:
+    """Property reading and writing one cell of a table column."""
+    def fget(self):
+        return getattr(self._table, name)[self._row]
+
+    def fset(self, value):
+        getattr(self._table, name)[self._row] = value
+
+    return property(fget, fset)
+
+
+class HPView(HP):
+    """HP backed by one row of a CreatureTable."""
+
+    __slots__ = ("_table", "_row")
+
+    max_hp = _column("max_hp")
+    real_hp = _column("real_hp")
+    temp_hp = _column("temp_hp")
+    shield = _column("shield")
+
+    def __init__(self, table, row: int):
+        self._table = table
+        self._row = row
+
+
+class StatsView(Stats):
+    """Stats backed by one row of a CreatureTable."""
+
+    __slots__ = ("_table", "_row")
+
+    STR = _column("STR")
+    DEX = _column("DEX")
+    CON = _column("CON")
+    WIS = _column("WIS")
+    INT = _column("INT")
+    CHA = _column("CHA")
+
+    def __init__(self, table, row: int):
+        self._table = table
+        self._row = row
+
+
+class CreatureTable:
+    """Struct-of-arrays store for large encounters.
+
+    HP fields, stats and the alive flag of every creature live in contiguous
+    typed arrays, one row per creature. Creatures added to the table drop their
+    own HP and Stats and hand out a view of their row whenever creature.hp or
+    creature.stats is read, so the regular Creature API keeps working while
+    bulk operations can walk the columns directly.
+    """
+
+    VIEWS = {"hp": HPView, "stats": StatsView}
+
+    def __init__(self):
+        self.creatures = []
+        self.alive = array("b")
+        for name in HP_FIELDS + STAT_FIELDS:
+            setattr(self, name, array("i"))
+
+    def add(self, creature) -> int:
+        """Copy a creature's values into a new row and bind the creature to it."""
+        if creature._table is not None:
+            raise ValueError(f"{creature.name} already belongs to a creature table.")
+
+        row = len(self.creatures)
+        for name in HP_FIELDS:
+            getattr(self, name).append(int(getattr(creature.hp, name)))
+        for name in STAT_FIELDS:
+            getattr(self, name).append(int(getattr(creature.stats, name)))
+        self.alive.append(creature.alive)
+        self.creatures.append(creature)
+
+        # Creature.__getattr__ makes views of the row in their place
+        del creature.hp
+        del creature.stats
+        creature._table = self
+        creature._row = row
+        return row
+
+    def view(self, part: str, row: int):
+        """A fresh HPView or StatsView of one row."""
+        return self.VIEWS[part](self, row)
+
+    def extend(self, creatures) -> list[int]:
+        """Add several creatures, returning their rows."""
+        return [self.add(c) for c in creatures]
+
+    def column(self, name: str) -> array:
+        """Return the array holding an HP field, a stat or 'alive'."""
+        if name not in HP_FIELDS + STAT_FIELDS + ("alive",):
+            raise KeyError(f"No such column: {name}")
+        return getattr(self, name)
+
+    def alive_count(self) -> int:
+        return sum(self.alive)
+
+    def __len__(self):
+        return len(self.creatures)
+
+    def __iter__(self):
+        return iter(self.creatures)
+
+    def __getitem__(self, row):
+        return self.creatures[row]
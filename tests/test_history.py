@@ -0,0 +1,46 @@
+import unittest
+from battle_sim.battle import Battle
+from battle_sim.history import BattleHistory
+from battle_sim.team import Team
+from characters.creature import Creature
+
+
+class UndoInitiativeTest(unittest.TestCase):
+    def setUp(self):
+        self.battle = Battle(verbose=False, seed=1)
+        self.battle.add_team(Team("TeamA", [Creature("a"), Creature("b")]))
+        self.extra = Creature("c")
+        self.battle.add_creature(self.extra)
+        self.history = BattleHistory(self.battle)
+        self.history.checkpoint()
+
+    def test_undo_roll_initiative(self):
+        self.battle.set_initiative(self.battle.get_initiative_list())
+        self.history.checkpoint()
+        self.assertTrue(self.history.undo())
+
+        self.assertFalse(self.battle.battle_started)
+        self.assertEqual(self.battle.turn_order, [])
+        self.assertEqual(self.battle._pending_creatures, [self.extra])
+
+        # The initiative can be rolled again and the battle played
+        self.battle.set_initiative(self.battle.get_initiative_list())
+        self.assertEqual(len(self.battle.turn_order), 3)
+        round_number, creature, _ = self.battle.next_turn()
+        self.assertEqual(round_number, 1)
+        self.assertIsNotNone(creature)
+
+    def test_redo_roll_initiative(self):
+        self.battle.set_initiative(self.battle.get_initiative_list())
+        self.history.checkpoint()
+        order = list(self.battle.turn_order)
+        self.history.undo()
+        self.assertTrue(self.history.redo())
+
+        self.assertTrue(self.battle.battle_started)
+        self.assertEqual(self.battle.turn_order, order)
+        self.assertEqual(self.battle._pending_creatures, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
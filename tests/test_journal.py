@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+from battle_sim.battle import Battle
+from battle_sim.journal import CombatJournal, replay
+from battle_sim.team import Team
+from characters.creature import Creature
+
+
+class ReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "fight.log")
+        self.battle = Battle(verbose=False, seed=3)
+        self.battle.add_team(Team("TeamA", [Creature("a"), Creature("b"), Creature("c")]))
+        self.journal = CombatJournal(self.battle, self.path)
+        self.battle.set_initiative(self.battle.get_initiative_list())
+
+    def tearDown(self):
+        self.journal.close()
+        self.folder.cleanup()
+
+    def assertReplayMatches(self):
+        recovered = replay(self.path, verbose=False)
+        self.assertEqual(recovered.cursor(), self.battle.cursor())
+        self.assertEqual([c.alive for c, _ in recovered.turn_order], [c.alive for c, _ in self.battle.turn_order])
+
+    def test_resurrect_then_replay(self):
+        second = self.battle.turn_order[1][0]
+        second.die()
+        self.battle.next_turn()
+        self.assertEqual(self.battle.cursor()["next"], 2)
+
+        # Landing right after the active creature, it acts next
+        second.resurrect()
+        self.assertEqual(self.battle.cursor()["next"], 1)
+        self.assertReplayMatches()
+
+    def test_death_then_replay(self):
+        self.battle.next_turn()
+        self.battle.turn_order[1][0].die()
+        self.assertReplayMatches()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import os
+import tempfile
+import unittest
+from battle_sim.team import Team, binary_to_json
+from characters.creature import Creature
+
+
+class BinaryRosterTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "party.team")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def round_trip(self, name):
+        Team(name, [Creature("a"), Creature("b")]).save_binary(self.path)
+        return Team.load_binary(self.path)
+
+    def test_unnamed_team(self):
+        team = self.round_trip(None)
+        self.assertIsNone(team.name)
+        self.assertEqual([c.name for c in team], ["a", "b"])
+
+    def test_empty_name_stays_empty(self):
+        self.assertEqual(self.round_trip("").name, "")
+
+    def test_unnamed_team_to_json(self):
+        self.round_trip(None)
+        json_path = os.path.join(self.folder.name, "party.json")
+        binary_to_json(self.path, json_path)
+        self.assertIsNone(Team.load(json_path).name)
+
+
+if __name__ == "__main__":
+    unittest.main()